@@ -0,0 +1,145 @@
+import asyncio
+import os
+
+import sync_notion
+from async_http import HostLimiter, create_client
+from async_notion_database_manager import AsyncNotionDatabaseManager
+from image_limits import check_download_size
+from image_store import ImageStore
+from portal_targets import PortalTarget, load_portal_targets
+from world_record import WorldRecord
+
+
+async def download_image(client, limiter, image_url, page_id, prop_name, image_store):
+    """
+    sync_notion.download_image の asyncio 版
+
+    Returns:
+        str: 保存された画像のパス
+
+    Raises:
+        ExpiredUrlError: URL の期限が切れている場合
+    """
+    filename, tmpfilename = sync_notion.image_paths(image_url, page_id, prop_name)
+
+    # すでに画像が存在する場合
+    if os.path.exists(filename):
+        return filename
+
+    try:
+        async with limiter.limit(image_url):
+            async with client.stream('GET', image_url) as response:
+                if response.status_code in (400, 403):
+                    await response.aread()
+                    if sync_notion.is_expired_response(response.status_code, response.text):
+                        raise sync_notion.ExpiredUrlError(image_url)
+                response.raise_for_status()
+                check_download_size(int(response.headers.get('Content-Length', 0)))
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    check_download_size(size)
+                    chunks.append(chunk)
+        # リサイズはCPU処理なのでイベントループを止めないよう別スレッドで行う
+        return await asyncio.to_thread(sync_notion.save_image, b''.join(chunks), filename, tmpfilename, image_store)
+    except sync_notion.ExpiredUrlError:
+        raise
+    except Exception as e:
+        print(f"画像ダウンロードエラー: {e}")
+        return None
+
+async def download_thumbnail(client, limiter, notion_manager, record, file, downloaded_images_log, image_store,
+                             locks):
+    """
+    sync_notion.download_thumbnail の asyncio 版
+
+    Args:
+        locks (dict): 同じ画像を複数のライブラリから同時にダウンロードしないための画像ごとのロック
+    """
+    async def refresh_url():
+        print(f'画像URLの期限切れのため再取得します: {record.name}')
+        page = await notion_manager.retrieve_page(record.page_id)
+        return page is not None and sync_notion.apply_refreshed_url(file, WorldRecord.from_notion_page(page))
+
+    file_name = sync_notion.thumbnail_file_name(file['url'])
+    async with locks.setdefault(file_name, asyncio.Lock()):
+        # 別のワールド・別のライブラリで同じ画像をダウンロード済みの場合
+        if file_name in downloaded_images_log:
+            file['local_path'] = downloaded_images_log[file_name]
+            return
+
+        if sync_notion.is_expiring(file):
+            await refresh_url()
+        try:
+            local_path = await download_image(client, limiter, file['url'], record.page_id, 'files', image_store)
+        except sync_notion.ExpiredUrlError:
+            local_path = None
+            if await refresh_url():
+                try:
+                    local_path = await download_image(client, limiter, file['url'], record.page_id, 'files',
+                                                      image_store)
+                except sync_notion.ExpiredUrlError as e:
+                    print(f"画像ダウンロードエラー: URLの期限切れ {e}")
+
+        if local_path:
+            downloaded_images_log[file_name] = local_path
+    print(f'新規画像: {local_path} を保存しました')
+    file['local_path'] = local_path
+
+async def sync_target(target: PortalTarget, notion_token, client, limiter, downloaded_images_log, image_store,
+                      locks):
+    """
+    sync_notion.sync_target の asyncio 版
+    """
+    notion_manager = AsyncNotionDatabaseManager(target.database_id, notion_token, client, limiter)
+
+    # データベースからすべてのページを取得
+    database_results = await notion_manager.query_database(
+        sorts=[{'property': 'PublicationDate', 'direction': 'descending'}],
+    )
+
+    # データの加工。画像は全ワールド分を並行してダウンロードする
+    records = sync_notion.decode_records(database_results)
+    # URL の期限が早い順に開始する
+    await asyncio.gather(*(
+        download_thumbnail(client, limiter, notion_manager, record, file, downloaded_images_log, image_store, locks)
+        for record, file in sync_notion.pending_thumbnails(records, downloaded_images_log)
+    ))
+
+    portal_library_data = sync_notion.process_portal_library_data(records, target.image_link_dir)
+    changed = sync_notion.write_portal_library_data(portal_library_data, records, target.output_path,
+                                                    target.hash_path)
+    sync_notion.write_catalogue_snapshot(records, target.snapshot_path)
+
+    print(f"Successfully synced {len(records)} pages from Notion database ({target.name}).")
+    return changed
+
+async def main():
+    # 環境変数から必要な情報を取得
+    notion_token = os.environ['NOTION_API_KEY']
+    targets = load_portal_targets()
+
+    try:
+        limiter = HostLimiter()
+        downloaded_images_log = sync_notion.load_downloaded_images_log()
+        image_store = ImageStore()
+        image_store.deduplicate(downloaded_images_log)
+        locks = {}
+
+        # 全ライブラリで HTTP の接続・ホストごとの制限・画像を共有する
+        async with create_client() as client:
+            changed = await asyncio.gather(*(
+                sync_target(target, notion_token, client, limiter, downloaded_images_log, image_store, locks)
+                for target in targets
+            ))
+
+        sync_notion.save_downloaded_images_log(downloaded_images_log)
+        image_store.save()
+
+        sync_notion.set_github_output('changed', str(any(changed)).lower())
+        sync_notion.remove_tmpdir()
+
+    except Exception as e:
+        print(f"Error syncing Notion database: {e}")
+        raise
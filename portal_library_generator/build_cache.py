@@ -0,0 +1,189 @@
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+DEFAULT_ARCHIVE = os.path.join(ROOT_DIR, '.build_cache/build_cache.tar.gz')
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# キャッシュに含めるファイル・ディレクトリ (リポジトリのルートからの相対パス)
+CACHE_PATHS = (
+    'docs/images',
+    'notion_images_log.json',
+    'image_hash_index.json',
+    'docs/portal_library_data.json',
+    'portal_library_data.sha256',
+    'update_schedule.json',
+    'world_catalogue.snap',
+    'world_catalogue.snap.idx',
+    # NOTION_DB_TARGETS で追加したライブラリの出力とビルド状態
+    'docs/libraries',
+    '.portal_state',
+)
+
+# ImageId 用のシンボリックリンクは毎回作り直すので含めない
+SYMLINK_PATTERN = re.compile(r'^\d{4}\.png$')
+
+
+def file_sha256(path):
+    """
+    ファイルの SHA-256 を求める
+
+    Args:
+        path (str): ファイルのパス
+
+    Returns:
+        str: SHA-256 の16進文字列
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_cache_path(relpath):
+    """
+    キャッシュ対象のパスかどうか。ルート外に書き込まないよう復元時に確認する
+
+    Args:
+        relpath (str): リポジトリのルートからの相対パス
+
+    Returns:
+        bool: キャッシュ対象の場合は True
+    """
+    if os.path.isabs(relpath) or '..' in relpath.split('/'):
+        return False
+    return any(relpath == path or relpath.startswith(f'{path}/') for path in CACHE_PATHS)
+
+def collect_files():
+    """
+    キャッシュに含めるファイルを列挙する
+
+    Returns:
+        list: リポジトリのルートからの相対パス
+    """
+    files = []
+    for cache_path in CACHE_PATHS:
+        full_path = os.path.join(ROOT_DIR, cache_path)
+        if os.path.isfile(full_path):
+            files.append(cache_path)
+        elif os.path.isdir(full_path):
+            for dirpath, dirnames, filenames in os.walk(full_path):
+                dirnames.sort()
+                reldir = os.path.relpath(dirpath, ROOT_DIR).replace(os.sep, '/')
+                for filename in sorted(filenames):
+                    file_path = os.path.join(dirpath, filename)
+                    if os.path.islink(file_path) or not os.path.isfile(file_path):
+                        continue
+                    if SYMLINK_PATTERN.match(filename):
+                        continue
+                    files.append(f'{reldir}/{filename}')
+    return files
+
+def export_cache(archive_path=DEFAULT_ARCHIVE):
+    """
+    キャッシュ対象のファイルとマニフェストを1つのアーカイブにまとめる
+
+    Args:
+        archive_path (str, optional): 出力先のアーカイブ
+
+    Returns:
+        dict: 作成したマニフェスト
+    """
+    files = collect_files()
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'files': {},
+    }
+    for relpath in files:
+        full_path = os.path.join(ROOT_DIR, relpath)
+        manifest['files'][relpath] = {
+            'sha256': file_sha256(full_path),
+            'size': os.path.getsize(full_path),
+        }
+
+    os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+    tmp_path = f'{archive_path}.tmp'
+    with tarfile.open(tmp_path, 'w:gz') as tar:
+        manifest_bytes = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        info = tarfile.TarInfo(MANIFEST_NAME)
+        info.size = len(manifest_bytes)
+        tar.addfile(info, io.BytesIO(manifest_bytes))
+        for relpath in files:
+            tar.add(os.path.join(ROOT_DIR, relpath), arcname=relpath, recursive=False)
+    os.replace(tmp_path, archive_path)
+
+    print(f'ビルドキャッシュを保存しました: {archive_path} ({len(files)} ファイル)')
+    return manifest
+
+def restore_cache(archive_path=DEFAULT_ARCHIVE):
+    """
+    アーカイブからキャッシュを復元する
+
+    マニフェストに載っていないファイルやハッシュが一致しないファイルは復元しない。
+
+    Args:
+        archive_path (str, optional): 復元するアーカイブ
+
+    Returns:
+        int: 復元したファイル数
+    """
+    if not os.path.exists(archive_path):
+        print(f'ビルドキャッシュがありません: {archive_path}')
+        return 0
+
+    try:
+        tar = tarfile.open(archive_path, 'r:gz')
+    except (tarfile.TarError, OSError) as e:
+        print(f'ビルドキャッシュを開けませんでした: {e}')
+        return 0
+
+    restored = 0
+    with tar:
+        try:
+            manifest = json.load(tar.extractfile(MANIFEST_NAME))
+        except (KeyError, ValueError) as e:
+            print(f'ビルドキャッシュのマニフェストが不正です: {e}')
+            return 0
+        if manifest.get('version') != MANIFEST_VERSION:
+            print('ビルドキャッシュの形式が異なるため使用しません')
+            return 0
+
+        for member in tar.getmembers():
+            entry = manifest['files'].get(member.name)
+            if entry is None or not member.isfile() or not is_cache_path(member.name):
+                continue
+            content = tar.extractfile(member).read()
+            if hashlib.sha256(content).hexdigest() != entry['sha256']:
+                print(f'ハッシュが一致しないため復元しません: {member.name}')
+                continue
+
+            full_path = os.path.join(ROOT_DIR, member.name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'wb') as f:
+                f.write(content)
+            restored += 1
+
+    print(f'ビルドキャッシュを復元しました: {restored} ファイル')
+    return restored
+
+def main():
+    parser = argparse.ArgumentParser(description='Build cache for docs/ and the image log')
+    parser.add_argument('command', choices=['export', 'restore'], help='Command to execute')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE, help='Archive path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_cache(args.archive)
+    elif args.command == 'restore':
+        restore_cache(args.archive)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import math
+import threading
+from contextlib import contextmanager
+
+# これを超える画素数の画像は JPEG の縮小デコード以外では読み込まない
+MAX_SOURCE_PIXELS = 40_000_000
+# 保存する画像の画素数の上限 (通常は元画像の半分の解像度)
+MAX_OUTPUT_PIXELS = 4_000_000
+# 全ワーカーで同時にデコードしてよい画素数の合計
+MAX_IN_FLIGHT_PIXELS = 60_000_000
+# ダウンロードするファイルサイズの上限
+MAX_DOWNLOAD_BYTES = 50 * 1024 * 1024
+
+
+class ImageTooLargeError(Exception):
+    pass
+
+
+class PixelBudget:
+    """
+    同時にデコードする画素数の合計を制限するクラス
+
+    予約しようとした画素数が残りより多い場合は、他のワーカーが解放するまで待つ。
+    上限より大きい1枚は、他に処理中の画像が無くなってから単独で処理させる。
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, pixels: int):
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight == 0 or self.in_flight + pixels <= self.capacity)
+            self.in_flight += pixels
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.in_flight -= pixels
+                self.condition.notify_all()
+
+
+DECODE_BUDGET = PixelBudget(MAX_IN_FLIGHT_PIXELS)
+
+
+def target_size(width: int, height: int):
+    """
+    保存する画像の大きさを決める
+
+    元画像の半分の解像度とし、それでも MAX_OUTPUT_PIXELS を超える場合は収まるまで縮める。
+
+    Args:
+        width (int): 元画像の幅
+        height (int): 元画像の高さ
+
+    Returns:
+        tuple: (幅, 高さ)
+    """
+    half_width, half_height = width // 2, height // 2
+    if half_width * half_height > MAX_OUTPUT_PIXELS:
+        ratio = math.sqrt(MAX_OUTPUT_PIXELS / (half_width * half_height))
+        half_width, half_height = int(half_width * ratio), int(half_height * ratio)
+    return max(half_width, 1), max(half_height, 1)
+
+
+def check_download_size(size: int):
+    """
+    ダウンロード中のサイズが上限を超えていないか確認する
+
+    Raises:
+        ImageTooLargeError: 上限を超えた場合
+    """
+    if size > MAX_DOWNLOAD_BYTES:
+        raise ImageTooLargeError(f'ファイルサイズが上限 ({MAX_DOWNLOAD_BYTES} bytes) を超えています')
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import threading
+
+from PIL import Image, ImageChops, ImageStat
+
+INDEX_PATH = os.path.join(os.path.dirname(__file__), '../image_hash_index.json')
+
+# dHash のハミング距離がこれ以下なら同じ画像の候補とする
+MAX_DISTANCE = 2
+
+# 暗い画面など一様な画像は dHash がほぼ同じになるので、候補は縮小した画素を比べて確認する
+COMPARE_SIZE = (128, 128)
+# 再エンコード・リサイズによる差として許容する画素値の差の平均と最大
+MAX_MEAN_DIFF = 6
+MAX_PIXEL_DIFF = 32
+# 許容する縦横比の差
+MAX_ASPECT_DIFF = 0.01
+
+
+def dhash(img, hash_size=8):
+    """
+    画像の dHash (隣り合う画素の明暗差による知覚ハッシュ) を求める
+
+    Args:
+        img (Image.Image): 対象の画像
+        hash_size (int, optional): 1辺のビット数
+
+    Returns:
+        int: hash_size * hash_size ビットのハッシュ
+    """
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def fingerprint(img):
+    """
+    画素の比較に使う値を求める
+
+    Args:
+        img (Image.Image): 対象の画像
+
+    Returns:
+        tuple: (縦横比, COMPARE_SIZE に縮小したグレースケール画像)
+    """
+    return img.width / img.height, img.convert('L').resize(COMPARE_SIZE, Image.LANCZOS)
+
+
+def is_same_fingerprint(fp, other_fp):
+    """
+    2枚の画像が同じ画像 (解像度や圧縮の違いのみ) かどうか
+
+    縦横比が同じで、縮小したグレースケールの画素の差が平均・最大ともに小さい場合に同じとみなす。
+    文字の位置だけが違う画像などは最大の差で区別する。
+
+    Args:
+        fp (tuple): 対象の画像の fingerprint
+        other_fp (tuple): 比較する画像の fingerprint
+
+    Returns:
+        bool: 同じ画像の場合は True
+    """
+    aspect, small = fp
+    other_aspect, other_small = other_fp
+    if abs(aspect - other_aspect) > MAX_ASPECT_DIFF:
+        return False
+    diff = ImageChops.difference(small, other_small)
+    return diff.getextrema()[1] <= MAX_PIXEL_DIFF and ImageStat.Stat(diff).mean[0] <= MAX_MEAN_DIFF
+
+
+class ImageStore:
+    """
+    保存済み画像のハッシュを管理し、同じ画像・ほぼ同じ画像を1ファイルにまとめるクラス
+
+    ダウンロードしたデータの SHA-256 で完全一致を判定する。再エンコード等によるほぼ一致は
+    dHash で候補を絞り、縮小した画素の比較で確認したものだけを同じ画像とみなす。
+
+    互いに別の画像と確認済みの画像 (kept) と、まとめた結果 (merged) は保存しておき、
+    次回以降は新しく追加された画像だけを kept と比べる。
+    """
+    def __init__(self, index_path=INDEX_PATH, max_distance=MAX_DISTANCE):
+        """
+        Args:
+            index_path (str, optional): ハッシュの保存先
+            max_distance (int, optional): 同じ画像とみなす dHash のハミング距離
+        """
+        self.index_path = index_path
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        # {ダウンロードしたデータの SHA-256: 保存先}
+        self.sha256 = {}
+        # {保存先: dHash の16進文字列}
+        self.dhash = {}
+        # 互いに別の画像と確認済みの保存先
+        self.kept = set()
+        # {重複していた保存先: まとめた先の保存先}
+        self.merged = {}
+        # {保存先: fingerprint}。実行中だけ保持し、画像を比較のたびに読み込まないようにする
+        self.fingerprints = {}
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            self.sha256 = {key: path for key, path in index.get('sha256', {}).items() if os.path.exists(path)}
+            self.dhash = {path: value for path, value in index.get('dhash', {}).items() if os.path.exists(path)}
+            self.kept = {path for path in index.get('kept', []) if path in self.dhash}
+            self.merged = {path: same for path, same in index.get('merged', {}).items() if same in self.dhash}
+
+    def save(self):
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'sha256': self.sha256,
+                'dhash': self.dhash,
+                'kept': sorted(self.kept),
+                'merged': self.merged,
+            }, f, ensure_ascii=False, indent=2)
+
+    def _fingerprint(self, path):
+        fp = self.fingerprints.get(path)
+        if fp is None:
+            with Image.open(path) as img:
+                fp = fingerprint(img)
+            self.fingerprints[path] = fp
+        return fp
+
+    def _find_same(self, image_hash, fp):
+        with self.lock:
+            candidates = [
+                path for path in self.kept
+                if (int(self.dhash[path], 16) ^ image_hash).bit_count() <= self.max_distance
+            ]
+        for path in candidates:
+            try:
+                if is_same_fingerprint(fp, self._fingerprint(path)):
+                    return path
+            except Exception as e:
+                print(f"画像を比較できませんでした: {path} - {e}")
+        return None
+
+    def find_exact(self, content_sha256):
+        """
+        同じデータから保存した画像を探す
+
+        Args:
+            content_sha256 (str): ダウンロードしたデータの SHA-256
+
+        Returns:
+            str: 保存先。見つからない場合は None
+        """
+        with self.lock:
+            return self.sha256.get(content_sha256)
+
+    def find_similar(self, image_hash, img):
+        """
+        ほぼ同じ画像を探す
+
+        Args:
+            image_hash (int): 対象の画像の dHash
+            img (Image.Image): 対象の画像。dHash が近い画像と画素を比べて確認する
+
+        Returns:
+            str: 保存先。見つからない場合は None
+        """
+        return self._find_same(image_hash, fingerprint(img))
+
+    def add(self, path, content_sha256, image_hash):
+        """
+        保存した画像を登録する。find_similar で同じ画像が無いと確認済みのものとして扱う
+
+        Args:
+            path (str): 保存先
+            content_sha256 (str): ダウンロードしたデータの SHA-256
+            image_hash (int): 画像の dHash
+        """
+        with self.lock:
+            self.sha256[content_sha256] = path
+            self.dhash[path] = f'{image_hash:016x}'
+            self.kept.add(path)
+
+    def deduplicate(self, downloaded_images_log):
+        """
+        ダウンロード済み画像の履歴のうち、ほぼ同じ画像を1ファイルにまとめる
+
+        前回までにまとめた画像は保存済みの結果を使い、まだ確認していない画像だけを kept と比べる。
+        dHash が近く、画素の比較でも同じと確認できた画像だけを、まとめた先のファイルを指すように
+        履歴を書き換える。見分けを誤った場合に戻せるよう、ファイル自体は削除しない。
+
+        Args:
+            downloaded_images_log (dict): ダウンロード済み画像の履歴
+        """
+        for key, path in downloaded_images_log.items():
+            if path in self.merged:
+                downloaded_images_log[key] = self.merged[path]
+                continue
+            if path in self.kept:
+                continue
+
+            try:
+                fp = self._fingerprint(path)
+                if path not in self.dhash:
+                    # 以前の実行で保存された画像は保存済みのファイルからハッシュを求める
+                    with Image.open(path) as img:
+                        self.dhash[path] = f'{dhash(img):016x}'
+            except Exception as e:
+                print(f"画像のハッシュを求められませんでした: {path} - {e}")
+                continue
+
+            same_path = self._find_same(int(self.dhash[path], 16), fp)
+            if same_path is None:
+                self.kept.add(path)
+                continue
+
+            print(f'重複画像: {path} の代わりに {same_path} を使用します')
+            self.merged[path] = same_path
+            downloaded_images_log[key] = same_path
+            # 以降はまとめた先のファイルだけを候補にする
+            del self.dhash[path]
+            self.sha256 = {sha: same_path if stored == path else stored for sha, stored in self.sha256.items()}
+
+
+def content_sha256(content):
+    """ダウンロードしたデータの SHA-256"""
+    return hashlib.sha256(content).hexdigest()
@@ -0,0 +1,98 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# NOTION_DB_TARGETS を指定しない場合は、従来通り NOTION_DB_ID の1件だけを出力する
+DEFAULT_NAME = 'default'
+# 2件目以降のライブラリの出力先とビルド状態の保存先 (リポジトリのルートからの相対パス)
+LIBRARIES_DIR = 'docs/libraries'
+STATE_DIR = '.portal_state'
+
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+@dataclass(frozen=True)
+class PortalTarget:
+    """
+    1つのポータルライブラリの取得元と出力先
+    """
+    name: str
+    database_id: str
+    output_path: str
+    image_link_dir: str
+    hash_path: str
+    snapshot_path: str
+
+    @classmethod
+    def default(cls, database_id):
+        """従来の出力先を使うライブラリ"""
+        return cls(
+            name=DEFAULT_NAME,
+            database_id=database_id,
+            output_path=os.path.join(ROOT_DIR, 'docs/portal_library_data.json'),
+            image_link_dir=os.path.join(ROOT_DIR, 'docs/images'),
+            hash_path=os.path.join(ROOT_DIR, 'portal_library_data.sha256'),
+            snapshot_path=os.path.join(ROOT_DIR, 'world_catalogue.snap'),
+        )
+
+    @classmethod
+    def named(cls, name, database_id):
+        """
+        docs/libraries/<name>/ に出力するライブラリ
+
+        ImageId 用のシンボリックリンクはライブラリごとに docs/libraries/<name>/images/ に作り、
+        画像ファイル自体は docs/images/ のものを共有する。
+        """
+        if not NAME_PATTERN.match(name) or name == DEFAULT_NAME:
+            raise ValueError(f'ライブラリ名が不正です: {name}')
+        library_dir = os.path.join(ROOT_DIR, LIBRARIES_DIR, name)
+        state_dir = os.path.join(ROOT_DIR, STATE_DIR, name)
+        return cls(
+            name=name,
+            database_id=database_id,
+            output_path=os.path.join(library_dir, 'portal_library_data.json'),
+            image_link_dir=os.path.join(library_dir, 'images'),
+            hash_path=os.path.join(state_dir, 'portal_library_data.sha256'),
+            snapshot_path=os.path.join(state_dir, 'world_catalogue.snap'),
+        )
+
+
+def load_portal_targets(environ=os.environ):
+    """
+    環境変数から出力するライブラリの一覧を作る
+
+    NOTION_DB_TARGETS には [{"name": "rooms", "database_id": "..."}, ...] の形式の JSON を指定する。
+    name を "default" にしたものは従来の出力先に書き込む。
+    指定が無い場合は NOTION_DB_ID のデータベースを従来の出力先に書き込む。
+
+    Args:
+        environ (dict, optional): 環境変数
+
+    Returns:
+        list[PortalTarget]: 出力するライブラリ
+
+    Raises:
+        ValueError: NOTION_DB_TARGETS が空のリストの場合や、ライブラリ名が不正・重複している場合
+    """
+    targets_json = environ.get('NOTION_DB_TARGETS')
+    if not targets_json:
+        return [PortalTarget.default(environ['NOTION_DB_ID'])]
+
+    entries = json.loads(targets_json)
+    if not entries:
+        raise ValueError('NOTION_DB_TARGETS にライブラリが1件もありません。1件だけの場合は未設定にして NOTION_DB_ID を使ってください')
+
+    targets = []
+    for entry in entries:
+        if entry['name'] == DEFAULT_NAME:
+            targets.append(PortalTarget.default(entry['database_id']))
+        else:
+            targets.append(PortalTarget.named(entry['name'], entry['database_id']))
+
+    names = [target.name for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f'ライブラリ名が重複しています: {names}')
+    return targets
@@ -1,14 +1,41 @@
 import os
+import argparse
+import asyncio
 import json
 from notion_client import Client
 import datetime
+import hashlib
 import requests
 import re
 from PIL import Image
 import io
 import shutil
-
-def fetch_notion_database(database_id, notion_client, sort_column='PublicationDate', sort_direction='descending'):
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 収集側と共通のワールドレコードを使う
+sys.path.append(os.path.join(os.path.dirname(__file__), '../vrc_world_collector'))
+from world_record import WorldRecord
+from catalogue_snapshot import SNAPSHOT_PATH, CatalogueSnapshot
+from rate_limiter import RateLimiter
+from image_store import ImageStore, content_sha256, dhash
+from image_limits import DECODE_BUDGET, MAX_SOURCE_PIXELS, ImageTooLargeError, check_download_size, target_size
+from portal_targets import PortalTarget, load_portal_targets
+
+# 期限までの残りがこれより短い URL は、ダウンロード前に取り直す
+EXPIRY_MARGIN = datetime.timedelta(minutes=1)
+# 上書きされたレコードがこの割合を超えたらスナップショットを書き直す
+SNAPSHOT_COMPACT_RATIO = 0.5
+# 全ライブラリで共有する Notion へのリクエスト上限 (Notion の制限は平均3回/秒)
+NOTION_REQUESTS_PER_SECOND = 3
+
+DEFAULT_OUTPUT_PATH = os.path.join(os.path.dirname(__file__), '../docs/portal_library_data.json')
+DEFAULT_HASH_PATH = os.path.join(os.path.dirname(__file__), '../portal_library_data.sha256')
+DEFAULT_IMAGE_LINK_DIR = os.path.join(os.path.dirname(__file__), '../docs/images')
+
+def fetch_notion_database(database_id, notion_client, sort_column='PublicationDate', sort_direction='descending',
+                          rate_limiter=None):
     """
     Notion データベースからすべてのページを取得する関数（ソート対応）
     
@@ -17,6 +44,7 @@ def fetch_notion_database(database_id, notion_client, sort_column='PublicationDa
         notion_client (Client): Notion クライアント
         sort_column (str, optional): ソート対象の列名（デフォルトは 'PublicationDate'）
         sort_direction (str, optional): ソートの方向 ('ascending' または 'descending')
+        rate_limiter (RateLimiter, optional): 他のライブラリと共有するリクエスト間隔の制限
     
     Returns:
         list: データベースのすべてのページデータ
@@ -34,6 +62,8 @@ def fetch_notion_database(database_id, notion_client, sort_column='PublicationDa
         })
 
     while has_more:
+        if rate_limiter:
+            rate_limiter.wait()
         # データベースをクエリ（ページネーション対応）
         response = notion_client.databases.query(
             database_id=database_id,
@@ -51,9 +81,9 @@ def fetch_notion_database(database_id, notion_client, sort_column='PublicationDa
 
     return all_results
 
-def download_image(image_url, page_id, prop_name):
+def image_paths(image_url, page_id, prop_name):
     """
-    画像をダウンロードし、ローカルに保存する関数
+    画像の保存先と一時保存先のパスを決める関数
     
     Args:
         image_url (str): 画像のURL
@@ -61,9 +91,8 @@ def download_image(image_url, page_id, prop_name):
         prop_name (str): プロパティ名
     
     Returns:
-        str: 保存された画像のパス
+        tuple: (保存先のパス, 一時保存先のパス)
     """
-    
     # 画像保存用ディレクトリ作成
     dirname = os.path.join(os.path.dirname(__file__), '../docs/images')
     os.makedirs(dirname, exist_ok=True)
@@ -74,6 +103,96 @@ def download_image(image_url, page_id, prop_name):
     file_extension = re.findall(r'^(\.(?:png|jpe?g))', os.path.splitext(image_url)[1])[0]
     filename = os.path.join(dirname, f'{page_id}_{prop_name}{file_extension}')
     tmpfilename = os.path.join(tmpdirname, f'{page_id}_{prop_name}{file_extension}')
+    return filename, tmpfilename
+
+def save_image(content, filename, tmpfilename, image_store):
+    """
+    ダウンロードした画像を半分の解像度にして保存する関数
+    
+    同じ画像・ほぼ同じ画像が保存済みの場合は保存せず、そのパスを返す。
+    
+    Args:
+        content (bytes): ダウンロードした画像
+        filename (str): 保存先のパス
+        tmpfilename (str): 一時保存先のパス
+        image_store (ImageStore): 保存済み画像のハッシュ
+    
+    Returns:
+        str: 保存された画像のパス
+    
+    Raises:
+        ImageTooLargeError: 縮小デコードできない形式で画素数が上限を超えている場合
+    """
+    sha256 = content_sha256(content)
+    same_path = image_store.find_exact(sha256)
+    if same_path:
+        print(f'同じ画像が保存済み: {same_path} を使用します')
+        return same_path
+
+    with open(tmpfilename, 'wb') as f:
+        f.write(content)
+
+    # 画像を半分の解像度にリサイズ
+    with Image.open(io.BytesIO(content)) as img:
+        # この時点ではヘッダしか読んでいないので、デコード前に大きさを確認できる
+        size = target_size(img.width, img.height)
+        if img.format == 'JPEG':
+            # JPEG は保存する大きさに近い解像度で直接デコードする
+            img.draft('RGB', size)
+        elif img.width * img.height > MAX_SOURCE_PIXELS:
+            raise ImageTooLargeError(f'画像が大きすぎます: {img.width}x{img.height}')
+
+        # デコード後の画像と縮小後の画像の分を予約する
+        with DECODE_BUDGET.reserve(img.width * img.height + size[0] * size[1]):
+            image_hash = dhash(img)
+            same_path = image_store.find_similar(image_hash, img)
+            if same_path:
+                print(f'ほぼ同じ画像が保存済み: {same_path} を使用します')
+                return same_path
+
+            half_res_img = img.resize(size, Image.LANCZOS)
+            
+            # 半解像度の画像を保存
+            half_res_img.save(filename)
+    
+    image_store.add(filename, sha256, image_hash)
+    return filename
+
+class ExpiredUrlError(Exception):
+    """Notion の署名付きURLの期限が切れている"""
+
+def is_expired_response(status_code, body):
+    """
+    署名付きURLの期限切れによるエラーかどうか
+    
+    Args:
+        status_code (int): HTTP ステータスコード
+        body (str): レスポンスの本文
+    
+    Returns:
+        bool: 期限切れの場合は True
+    """
+    # S3 は期限切れの場合に 403 (Request has expired) を返す
+    return status_code in (400, 403) and 'expired' in body.lower()
+
+def download_image(image_url, page_id, prop_name, image_store, session=None):
+    """
+    画像をダウンロードし、ローカルに保存する関数
+    
+    Args:
+        image_url (str): 画像のURL
+        page_id (str): ページID
+        prop_name (str): プロパティ名
+        image_store (ImageStore): 保存済み画像のハッシュ
+        session (requests.Session, optional): 接続を使い回すセッション
+    
+    Returns:
+        str: 保存された画像のパス
+    
+    Raises:
+        ExpiredUrlError: URL の期限が切れている場合
+    """
+    filename, tmpfilename = image_paths(image_url, page_id, prop_name)
 
     # すでに画像が存在する場合
     if os.path.exists(filename):
@@ -82,23 +201,20 @@ def download_image(image_url, page_id, prop_name):
 
     # 画像をダウンロード
     try:
-        response = requests.get(image_url)
-        response.raise_for_status()
-        
-        with open(tmpfilename, 'wb') as f:
-            f.write(response.content)
-
-        # 画像を半分の解像度にリサイズ
-        with Image.open(io.BytesIO(response.content)) as img:
-            # 現在の幅と高さの半分にリサイズ
-            half_width = img.width // 2
-            half_height = img.height // 2
-            half_res_img = img.resize((half_width, half_height), Image.LANCZOS)
-            
-            # 半解像度の画像を保存
-            half_res_img.save(filename)
-        
-        return filename
+        with (session or requests).get(image_url, stream=True) as response:
+            if is_expired_response(response.status_code, response.text if response.status_code in (400, 403) else ''):
+                raise ExpiredUrlError(image_url)
+            response.raise_for_status()
+            check_download_size(int(response.headers.get('Content-Length', 0)))
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                check_download_size(size)
+                chunks.append(chunk)
+        return save_image(b''.join(chunks), filename, tmpfilename, image_store)
+    except ExpiredUrlError:
+        raise
     except Exception as e:
         print(f"画像ダウンロードエラー: {e}")
         return None
@@ -107,6 +223,8 @@ def load_downloaded_images_log():
     """
     ダウンロード済み画像の履歴を読み込む
     
+    ビルドキャッシュから復元した画像はそのまま使い、ファイルが無いものだけ取り直す。
+    
     Returns:
         dict: ダウンロード済み画像の情報
     """
@@ -114,7 +232,8 @@ def load_downloaded_images_log():
     log_path = os.path.join(dirname, 'notion_images_log.json')
     if os.path.exists(log_path):
         with open(log_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            log = json.load(f)
+        return {key: path for key, path in log.items() if path and os.path.exists(path)}
     return {}
 
 def save_downloaded_images_log(log):
@@ -129,117 +248,183 @@ def save_downloaded_images_log(log):
     with open(log_path, 'w', encoding='utf-8') as f:
         json.dump(log, f, ensure_ascii=False, indent=2)
 
-def process_database_data(results):
+def process_database_data(results, notion_client, downloaded_images_log, image_store, rate_limiter=None,
+                          session=None):
     """
     取得したデータを処理する関数
     
     Args:
         results (list): Notionから取得したページデータ
+        notion_client (Client): Notion クライアント。URL の期限切れ時にページを取り直すのに使う
+        downloaded_images_log (dict): ダウンロード済み画像の履歴
+        image_store (ImageStore): 保存済み画像のハッシュ
+        rate_limiter (RateLimiter, optional): 他のライブラリと共有するリクエスト間隔の制限
+        session (requests.Session, optional): 画像のダウンロードに使うセッション
     
     Returns:
-        list: 加工したデータ
+        list[WorldRecord]: 加工したデータ
     """
-    # ダウンロード済み画像の履歴を読み込み
-    downloaded_images_log = load_downloaded_images_log()
-
-    processed_data = []
-    for item in results:
-        processed_item = {
-            'id': item['id'],
-            'created_time': item['created_time'],
-            'last_edited_time': item['last_edited_time'],
-            'properties': {}
-        }
+    def refresh_record(page_id):
+        if rate_limiter:
+            rate_limiter.wait()
+        return WorldRecord.from_notion_page(notion_client.pages.retrieve(page_id=page_id))
 
-        # 各プロパティを解析
-        for prop_name, prop_value in item['properties'].items():
-            processed_prop = process_property(prop_value, item['id'], downloaded_images_log)
-            if processed_prop is not None:
-                processed_item['properties'][prop_name] = processed_prop
+    records = decode_records(results)
+    process_thumbnails(records, downloaded_images_log, image_store, refresh_record, session)
+    return records
 
-        id = processed_item['properties'].get('ID', None)
+def decode_records(results):
+    """
+    Notionから取得したページデータを WorldRecord に変換する
+    
+    Args:
+        results (list): Notionから取得したページデータ
+    
+    Returns:
+        list[WorldRecord]: 変換したデータ
+    """
+    # 列ごとの取り出し方は最初のページから一度だけ決める
+    decoder = WorldRecord.compile_decoder(results[0]['properties']) if results else None
+    return [WorldRecord.from_notion_page(item, decoder) for item in results]
 
-        processed_data.append(processed_item)
+def thumbnail_file_name(file_url):
+    """ダウンロード済み画像の履歴のキーにするファイル名"""
+    return re.findall(r'^https?://.+/(.+\.(?:png|jpe?g))', file_url)[0]
 
-    # ダウンロード済み画像の履歴を保存
-    save_downloaded_images_log(downloaded_images_log)
+def expiry_time(file):
+    """
+    署名付きURLの期限。期限が無い (外部URLなど) 場合は None
+    
+    Args:
+        file (dict): WorldRecord.clear_thumbnail の要素
+    
+    Returns:
+        datetime: 期限
+    """
+    if not file.get('expiry_time'):
+        return None
+    return datetime.datetime.fromisoformat(file['expiry_time'])
 
-    return processed_data
+def is_expiring(file):
+    """期限切れ、またはダウンロード中に期限が切れそうかどうか"""
+    expiry = expiry_time(file)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return expiry is not None and expiry - now < EXPIRY_MARGIN
 
-def process_property(prop, page_id, downloaded_images_log):
+def pending_thumbnails(records, downloaded_images_log):
     """
-    プロパティの値を適切な形式に変換
+    ダウンロード済みの画像には local_path を設定し、未ダウンロードの画像を返す
     
     Args:
-        prop (dict): Notionのプロパティデータ
-        page_id (str): ページのID
+        records (list[WorldRecord]): 対象のワールド
         downloaded_images_log (dict): ダウンロード済み画像の履歴
     
     Returns:
-        変換後のプロパティ値
+        list: (WorldRecord, clear_thumbnail の要素) のリスト。URL の期限が早い順
     """
-    prop_type = prop['type']
-
-    def handle_files(files):
-        processed_files = []
-        for file in files:
-            file_url = file['file']['url']
-            file_name = re.findall(r'^https?://.+/(.+\.(?:png|jpe?g))', file_url)[0]
+    pending = []
+    for record in records:
+        for file in record.clear_thumbnail:
+            file_name = thumbnail_file_name(file['url'])
             
             # すでにダウンロード済みの画像かチェック
             if file_name in downloaded_images_log:
-                local_path = downloaded_images_log[file_name]
-                print(f'画像ダウンロード済み: {local_path} を使用します')
+                file['local_path'] = downloaded_images_log[file_name]
+                print(f'画像ダウンロード済み: {file["local_path"]} を使用します')
             else:
-                # 新規ダウンロード
-                local_path = download_image(file_url, page_id, 'files')
-                if local_path:
-                    downloaded_images_log[file_name] = local_path
-                print(f'新規画像: {local_path} を保存しました')
-            
-            processed_files.append({
-                'name': file['name'],
-                'url': file_url,
-                'local_path': local_path
-            })
-        return processed_files if processed_files else None
-
-    def handle_media(media):
-        file_url = media['url']
-        
-        # すでにダウンロード済みの画像かチェック
-        if file_url in downloaded_images_log:
-            local_path = downloaded_images_log[file_url]
-        else:
-            # 新規ダウンロード
-            local_path = download_image(file_url, page_id, 'media')
-            if local_path:
-                downloaded_images_log[file_url] = local_path
-        
-        return {
-            'url': file_url,
-            'local_path': local_path
-        } if local_path else None
-    
-    # 様々なプロパティタイプに対応
-    type_handlers = {
-        'title': lambda p: p['title'][0]['plain_text'] if p['title'] else None,
-        'rich_text': lambda p: p['rich_text'][0]['plain_text'] if p['rich_text'] else None,
-        'number': lambda p: p['number'],
-        'select': lambda p: p['select']['name'] if p['select'] else None,
-        'multi_select': lambda p: [item['name'] for item in p['multi_select']] if p['multi_select'] else [],
-        'date': lambda p: p['date']['start'] if p['date'] else None,
-        'checkbox': lambda p: p['checkbox'],
-        'url': lambda p: p['url'],
-        'email': lambda p: p['email'],
-        'phone_number': lambda p: p['phone_number'],
-        # 画像プロパティ
-        'files': lambda p: handle_files(p['files']) if p['files'] else None,
-        'media': lambda p: handle_media(p['media']) if p['media'] else None,
-    }
+                file['local_path'] = None
+                pending.append((record, file))
+    
+    # 期限切れで取り直しにならないよう、期限が早いものから順にダウンロードする
+    far_future = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+    pending.sort(key=lambda item: expiry_time(item[1]) or far_future)
+    return pending
+
+def apply_refreshed_url(file, fresh_record):
+    """
+    取り直したページの URL と期限で file を更新する
+    
+    Args:
+        file (dict): WorldRecord.clear_thumbnail の要素
+        fresh_record (WorldRecord): 取り直したページ
+    
+    Returns:
+        bool: 同じ画像が見つかった場合は True
+    """
+    file_name = thumbnail_file_name(file['url'])
+    for fresh_file in fresh_record.clear_thumbnail:
+        if thumbnail_file_name(fresh_file['url']) == file_name:
+            file['url'] = fresh_file['url']
+            file['expiry_time'] = fresh_file['expiry_time']
+            return True
+    return False
+
+def refresh_url(record, file, refresh_record):
+    """
+    ページを1件だけ取り直して file の URL を新しくする
+    
+    Returns:
+        bool: 新しい URL を取得できた場合は True
+    """
+    print(f'画像URLの期限切れのため再取得します: {record.name}')
+    try:
+        return apply_refreshed_url(file, refresh_record(record.page_id))
+    except Exception as e:
+        print(f"ページ再取得エラー: {e}")
+        return False
+
+# 同じ画像を複数のライブラリから同時にダウンロードしないためのロック
+_thumbnail_locks = {}
+_thumbnail_locks_guard = threading.Lock()
+
+def thumbnail_lock(file_name):
+    """画像ごとのロックを返す"""
+    with _thumbnail_locks_guard:
+        return _thumbnail_locks.setdefault(file_name, threading.Lock())
 
-    handler = type_handlers.get(prop_type)
-    return handler(prop) if handler else None
+def download_thumbnail(record, file, downloaded_images_log, image_store, refresh_record, session=None):
+    """
+    クリア画像を1枚ダウンロードし、file に local_path を設定する
+    
+    URL の期限が切れている場合は、そのページだけを取り直してからダウンロードする。
+    """
+    file_name = thumbnail_file_name(file['url'])
+    with thumbnail_lock(file_name):
+        # 別のワールド・別のライブラリで同じ画像をダウンロード済みの場合
+        if file_name in downloaded_images_log:
+            file['local_path'] = downloaded_images_log[file_name]
+            return
+
+        if is_expiring(file):
+            refresh_url(record, file, refresh_record)
+        try:
+            local_path = download_image(file['url'], record.page_id, 'files', image_store, session)
+        except ExpiredUrlError:
+            local_path = None
+            if refresh_url(record, file, refresh_record):
+                try:
+                    local_path = download_image(file['url'], record.page_id, 'files', image_store, session)
+                except ExpiredUrlError as e:
+                    print(f"画像ダウンロードエラー: URLの期限切れ {e}")
+
+        if local_path:
+            downloaded_images_log[file_name] = local_path
+    print(f'新規画像: {local_path} を保存しました')
+    file['local_path'] = local_path
+
+def process_thumbnails(records, downloaded_images_log, image_store, refresh_record, session=None):
+    """
+    クリア画像をダウンロードし、record.clear_thumbnail に local_path を設定する
+    
+    Args:
+        records (list[WorldRecord]): 対象のワールド
+        downloaded_images_log (dict): ダウンロード済み画像の履歴
+        image_store (ImageStore): 保存済み画像のハッシュ
+        refresh_record (Callable): ページIDからページを取り直して WorldRecord を返す関数
+        session (requests.Session, optional): 画像のダウンロードに使うセッション
+    """
+    for record, file in pending_thumbnails(records, downloaded_images_log):
+        download_thumbnail(record, file, downloaded_images_log, image_store, refresh_record, session)
 
 def remove_symlinks(directory):
     """
@@ -264,34 +449,38 @@ def remove_symlinks(directory):
             except Exception as e:
                 print(f"エラー: {full_path} の削除に失敗 - {e}")
 
-def process_portal_library_data(results):
+def process_portal_library_data(results, image_link_dir=DEFAULT_IMAGE_LINK_DIR):
 
     categories = []
 
     vrc_image_id = 0
+    # 同じ画像を使うワールドには同じ ImageId を割り当てる
+    image_ids = {}
 
     # シンボリックリンクを全て削除
-    remove_symlinks(os.path.join(os.path.dirname(__file__), '../docs/images'))
+    os.makedirs(image_link_dir, exist_ok=True)
+    remove_symlinks(image_link_dir)
 
-    for result in results:
-        properties = result['properties']
-        is_quest_support = 'Android' in properties['Platform']
-        if properties.get('ClearThumbnail', None):
+    for record in results:
+        if record.clear_thumbnail and record.clear_thumbnail[0]['local_path'] in image_ids:
+            image_id = image_ids[record.clear_thumbnail[0]['local_path']]
+        elif record.clear_thumbnail and record.clear_thumbnail[0]['local_path']:
             # 画像に対してアクセスしやすいように id と ファイルを紐づけるシンボリックリンクを追加
-            ori_file = properties['ClearThumbnail'][0]['local_path']
-            symlink_file = os.path.join(os.path.dirname(ori_file), f'{str(vrc_image_id).zfill(4)}.png')
-            os.symlink(ori_file, symlink_file)
+            ori_file = record.clear_thumbnail[0]['local_path']
+            symlink_file = os.path.join(image_link_dir, f'{str(vrc_image_id).zfill(4)}.png')
+            os.symlink(os.path.relpath(ori_file, image_link_dir), symlink_file)
             image_id = vrc_image_id
+            image_ids[ori_file] = image_id
             vrc_image_id = vrc_image_id + 1
             print(f'シンボリックリンク: {symlink_file} を追加')
         else:
             # 画像未登録の場合は -1 にしておく
             image_id = -1
 
-        category = properties.get('Category', None)
+        category = record.category
 
         if category is None:
-            print(f"ワールドにカテゴリが設定されていないためスキップ: {properties['Name']}")
+            print(f"ワールドにカテゴリが設定されていないためスキップ: {record.name}")
             continue
 
         # カテゴリが未登録の場合は新規追加
@@ -304,22 +493,7 @@ def process_portal_library_data(results):
             categories.append(existing_category)
 
         # 該当するカテゴリのWorldsに値を追加
-        existing_category['Worlds'].append({
-            'ID': properties['ID'],
-            'Name': properties['Name'],
-            'Author': properties['Author'],
-            'RecommendedCapacity': properties['RecommendedCapacity'],
-            'Capacity': properties['Capacity'],
-            'Description': properties['Description'],
-            'ReleaseStatus': properties['ReleaseStatus'],
-            'Comment': properties.get('Comment', ''),
-            'Difficulty': properties.get('Difficulty', 'unknown'),
-            'Platform': {
-                'PC': True,
-                'Android': is_quest_support,
-            },
-            'ImageId': image_id,
-        })
+        existing_category['Worlds'].append(record.to_portal_world(image_id))
 
     # 最終更新日時を取得
     tz_jst = datetime.timezone(datetime.timedelta(hours=9), name='JST')
@@ -334,39 +508,185 @@ def process_portal_library_data(results):
     }
     return portal_library_data
 
+def portal_library_hash(portal_library_data, records):
+    """
+    ポータルライブラリの内容のハッシュを求める
+    
+    LastUpdate は毎回変わるので含めず、ImageId に対応する画像ファイルは含める。
+    
+    Args:
+        portal_library_data (dict): process_portal_library_data の結果
+        records (list[WorldRecord]): process_portal_library_data に渡したデータ
+    
+    Returns:
+        str: SHA-256 の16進文字列
+    """
+    images = [
+        [record.clear_thumbnail[0]['name'], os.path.basename(record.clear_thumbnail[0]['local_path'])]
+        for record in records
+        if record.clear_thumbnail and record.clear_thumbnail[0]['local_path']
+    ]
+    payload = {
+        'ReverseCategorys': portal_library_data['ReverseCategorys'],
+        'ShowPrivateWorld': portal_library_data['ShowPrivateWorld'],
+        'Categorys': portal_library_data['Categorys'],
+        'Images': images,
+    }
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def write_portal_library_data(portal_library_data, records, output_path=DEFAULT_OUTPUT_PATH,
+                              hash_path=DEFAULT_HASH_PATH):
+    """
+    ポータルライブラリのデータを JSON ファイルに保存する
+    
+    前回と内容が同じ場合は書き込まない。
+    
+    Args:
+        portal_library_data (dict): 保存するデータ
+        records (list[WorldRecord]): process_portal_library_data に渡したデータ
+        output_path (str, optional): 保存先
+        hash_path (str, optional): 前回の内容のハッシュの保存先
+    
+    Returns:
+        bool: 書き込んだ場合は True
+    """
+    content_hash = portal_library_hash(portal_library_data, records)
+    # 手動実行時など、前回のデプロイに失敗していても書き直せるようにする
+    force_write = os.environ.get('PORTAL_LIBRARY_FORCE_WRITE') == 'true'
+    if not force_write and os.path.exists(output_path) and os.path.exists(hash_path):
+        with open(hash_path, 'r', encoding='utf-8') as f:
+            if f.read().strip() == content_hash:
+                print('ポータルライブラリの内容に変更が無いため書き込みをスキップ')
+                return False
+
+    # ディレクトリ作成
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    os.makedirs(os.path.dirname(hash_path), exist_ok=True)
+
+    # JSONファイルに保存
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(portal_library_data, f, ensure_ascii=False, indent=2)
+    with open(hash_path, 'w', encoding='utf-8') as f:
+        f.write(content_hash)
+    return True
+
+def write_catalogue_snapshot(records, path=SNAPSHOT_PATH):
+    """
+    ワールド一覧のスナップショットに変更のあったワールドを追記する
+    
+    データベースから削除されたワールドがある場合や、上書きされたレコードが
+    増えた場合は最新のワールドだけを残して書き直す。
+    
+    Args:
+        records (list[WorldRecord]): 最新のワールド
+        path (str, optional): スナップショットのパス
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with CatalogueSnapshot(path, create=True) as snapshot:
+        appended = snapshot.update(records)
+        # 同じ ID のワールドが複数あっても削除されたワールドを見落とさないよう、重複を除いて比べる
+        world_ids = list(dict.fromkeys(record.id for record in records if record.id))
+        if len(snapshot) > len(world_ids) or snapshot.garbage_ratio() > SNAPSHOT_COMPACT_RATIO:
+            snapshot.compact(world_ids)
+            print(f'スナップショットを書き直しました: {len(world_ids)} ワールド')
+    print(f'スナップショットに追記: {appended} ワールド')
+
+def set_github_output(name, value):
+    """
+    GitHub Actions の後続ステップに値を渡す。Actions 外では何もしない
+    
+    Args:
+        name (str): 出力名
+        value (str): 値
+    """
+    output_path = os.environ.get('GITHUB_OUTPUT')
+    if output_path:
+        with open(output_path, 'a', encoding='utf-8') as f:
+            f.write(f'{name}={value}\n')
+
+def remove_tmpdir():
+    """一時ディレクトリを削除する"""
+    tmpdir = os.path.join(os.path.dirname(__file__), '../tmp')
+    if os.path.exists(tmpdir):
+        shutil.rmtree(tmpdir)
+
+def sync_target(target: PortalTarget, notion_client, downloaded_images_log, image_store, rate_limiter, session):
+    """
+    1つのライブラリを取得して出力する
+    
+    Args:
+        target (PortalTarget): 取得元と出力先
+        notion_client (Client): 全ライブラリで共有する Notion クライアント
+        downloaded_images_log (dict): 全ライブラリで共有するダウンロード済み画像の履歴
+        image_store (ImageStore): 全ライブラリで共有する保存済み画像のハッシュ
+        rate_limiter (RateLimiter): 全ライブラリで共有するリクエスト間隔の制限
+        session (requests.Session): 全ライブラリで共有する画像のダウンロード用のセッション
+    
+    Returns:
+        bool: 出力を書き換えた場合は True
+    """
+    # データベースからすべてのページを取得
+    database_results = fetch_notion_database(target.database_id, notion_client, rate_limiter=rate_limiter)
+
+    # データの加工
+    processed_data = process_database_data(database_results, notion_client, downloaded_images_log, image_store,
+                                           rate_limiter, session)
+    portal_library_data = process_portal_library_data(processed_data, target.image_link_dir)
+
+    changed = write_portal_library_data(portal_library_data, processed_data, target.output_path, target.hash_path)
+    write_catalogue_snapshot(processed_data, target.snapshot_path)
+
+    print(f"Successfully synced {len(processed_data)} pages from Notion database ({target.name}).")
+    return changed
+
 def main():
     # 環境変数から必要な情報を取得
     notion_token = os.environ['NOTION_API_KEY']
-    database_id = os.environ['NOTION_DB_ID']
+    targets = load_portal_targets()
 
     try:
         # Notion クライアントの初期化
         notion_client = Client(auth=notion_token)
-
-        # データベースからすべてのページを取得
-        database_results = fetch_notion_database(database_id, notion_client)
-
-        # データの加工
-        processed_data = process_database_data(database_results)
-        portal_library_data = process_portal_library_data(processed_data)
-
-        # ディレクトリ作成
-        os.makedirs(os.path.join(os.path.dirname(__file__), '../docs'), exist_ok=True)
-
-        # JSONファイルに保存
-        with open(os.path.join(os.path.dirname(__file__), '../docs/portal_library_data.json'), 'w', encoding='utf-8') as f:
-            json.dump(portal_library_data, f, ensure_ascii=False, indent=2)
-
-        # 一時ディレクトリ削除
-        tmpdir = os.path.join(os.path.dirname(__file__), '../tmp')
-        if os.path.exists(tmpdir):
-            shutil.rmtree(os.path.join(os.path.dirname(__file__), '../tmp'))
-
-        print(f"Successfully synced {len(processed_data)} pages from Notion database.")
+        rate_limiter = RateLimiter(NOTION_REQUESTS_PER_SECOND)
+
+        # ダウンロード済み画像の履歴を読み込み
+        downloaded_images_log = load_downloaded_images_log()
+        # 保存済みの重複画像をまとめる
+        image_store = ImageStore()
+        image_store.deduplicate(downloaded_images_log)
+
+        # ライブラリごとに並行して処理する。画像と画像サーバーへの接続は全ライブラリで共有する
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor, requests.Session() as session:
+            # 各ライブラリのスレッドが同時に接続できるようにする
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(len(targets), requests.adapters.DEFAULT_POOLSIZE))
+            session.mount('https://', adapter)
+            futures = [
+                executor.submit(sync_target, target, notion_client, downloaded_images_log, image_store, rate_limiter,
+                                session)
+                for target in targets
+            ]
+            changed = [future.result() for future in futures]
+
+        # ダウンロード済み画像の履歴を保存
+        save_downloaded_images_log(downloaded_images_log)
+        image_store.save()
+
+        set_github_output('changed', str(any(changed)).lower())
+        remove_tmpdir()
 
     except Exception as e:
         print(f"Error syncing Notion database: {e}")
         raise
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Portal Library Generator')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Run with asyncio and httpx')
+    args = parser.parse_args()
+
+    if args.use_async:
+        # httpx が必要なので使うときだけ読み込む
+        import async_sync_notion
+        asyncio.run(async_sync_notion.main())
+    else:
+        main()
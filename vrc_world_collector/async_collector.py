@@ -0,0 +1,201 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+import async_vrchat
+from async_http import HostLimiter, create_client
+from async_notion_database_manager import AsyncNotionDatabaseManager
+from notion_database_manager import NotionRequestError
+from notion_write_queue import INDEX_DELAY_SECONDS
+from register import parse_world_id
+from update import UPDATE_COLUMNS
+from update_scheduler import DEFAULT_BUDGET, UpdateScheduler
+from world_record import WorldRecord
+
+# (ワールド一覧のファイル, 対応プラットフォーム)。先に書いたものが優先される
+WORLD_LISTS = (
+    ('./world_list/cross_platform_list.txt', ['PC', 'Android']),
+    ('./world_list/pc_only_list.txt', ['PC']),
+)
+
+MAX_RETRIES = 3
+
+
+def get_user_agent():
+    vrc_app_name = os.getenv('VRC_APP_NAME')
+    vrc_app_version = os.getenv('VRC_APP_VERSION')
+    vrc_mail = os.getenv('VRC_MAIL')
+    return f'{vrc_app_name}/{vrc_app_version} {vrc_mail}'
+
+
+def get_notion_manager(client: httpx.AsyncClient, limiter: HostLimiter):
+    api_key = os.getenv('NOTION_API_KEY')
+    db_id = os.getenv('NOTION_DB_ID')
+    return AsyncNotionDatabaseManager(db_id, api_key, client, limiter)
+
+
+async def write_with_retry(world_id: str, operation: Callable[[int], Awaitable[Any]]) -> bool:
+    """
+    Notion への書き込みを失敗時に再試行する
+
+    Args:
+        world_id (str): 対象のワールドID
+        operation (Callable): 試行回数を受け取り、成功時に真となる値を返すコルーチン関数
+
+    Returns:
+        bool: 成功した場合は True
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt > 0:
+            await asyncio.sleep(2 ** attempt)
+        try:
+            if await operation(attempt):
+                return True
+        except NotionRequestError as e:
+            print(f'{world_id} の書き込み中にエラーが発生: {e}')
+            if not e.retryable:
+                # 入力内容の誤りなどは何度送っても失敗するので再試行しない
+                break
+    print(f'{world_id} の書き込みに失敗しました')
+    return False
+
+
+async def register_world(client, limiter, notion_manager, world_id, platform, stop: asyncio.Event):
+    if stop.is_set():
+        return
+    try:
+        record = await async_vrchat.get_world_info(client, limiter, world_id, platform, stop)
+    except async_vrchat.RequestCancelled:
+        return
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            print(f'{world_id} のワールドが見つかりません。スキップ。')
+        elif e.response.status_code == 429:
+            print("エラー: レートリミットを超えました (429 Too Many Requests)。処理を中断します。")
+            stop.set()
+        else:
+            print(f"VRChat API エラーが発生しました: {e}")
+        return
+    except httpx.HTTPError as e:
+        print(f"VRChat API エラーが発生しました: {e}")
+        return
+
+    if record.publication_date is None:
+        print('Private worldなので、公開日を登録しない')
+
+    # 前回までの作成が Notion 側で処理された可能性があるか
+    may_exist = False
+
+    async def operation(attempt):
+        nonlocal may_exist
+        if may_exist:
+            # タイムアウトや 5xx でも作成済みの場合があるので、検索で無いと確認できた場合だけ作り直す
+            await asyncio.sleep(INDEX_DELAY_SECONDS)
+            if await notion_manager.find_page_by_world_id(record.id):
+                print(f'{record.id} は作成済みだったため再作成しない')
+                return True
+        try:
+            new_record = await notion_manager.add_database_record(record.to_notion_properties(), raise_errors=True)
+        except NotionRequestError as e:
+            may_exist = may_exist or e.may_have_succeeded
+            raise
+        if new_record:
+            print('新しいレコードが正常に追加されました')
+            print(f'ページID: {new_record["id"]}')
+        return new_record
+
+    await write_with_retry(record.id, operation)
+
+
+async def register():
+    """register.main の asyncio 版"""
+    limiter = HostLimiter()
+    async with create_client(get_user_agent()) as client:
+        notion_manager = get_notion_manager(client, limiter)
+
+        print('Step1. 登録済みワールド一覧のIDを取得')
+        claimed_world_ids = set(await notion_manager.get_column_values('ID'))
+
+        print('Step2. ワールドを登録')
+        stop = asyncio.Event()
+        tasks = []
+        for path, platform in WORLD_LISTS:
+            with open(path) as f:
+                for url in f:
+                    world_id = parse_world_id(url).strip()
+                    if world_id in claimed_world_ids:
+                        print('登録済み。スキップする。')
+                        continue
+                    claimed_world_ids.add(world_id)
+                    tasks.append(register_world(client, limiter, notion_manager, world_id, platform, stop))
+        await asyncio.gather(*tasks)
+
+
+async def update_world(client, limiter, notion_manager, scheduler, registered: WorldRecord, stop: asyncio.Event):
+    if stop.is_set():
+        return
+    try:
+        world = await async_vrchat.get_world_info(client, limiter, registered.id, stop=stop)
+    except async_vrchat.RequestCancelled:
+        return
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
+            print("エラー: レートリミットを超えました (429 Too Many Requests)。処理を中断します。")
+            stop.set()
+        else:
+            print(f"VRChat API エラーが発生しました: {e}")
+            scheduler.mark_checked(registered.id, False)
+        return
+    except httpx.HTTPError as e:
+        print(f"VRChat API エラーが発生しました: {e}")
+        return
+
+    if world.publication_date is None:
+        print('Private worldなので、公開日を登録しない')
+
+    changed_columns = world.changed_columns(registered, UPDATE_COLUMNS)
+    scheduler.mark_checked(registered.id, bool(changed_columns))
+    if not changed_columns:
+        print(f'{registered.id} は変更が無いためスキップ')
+        return
+
+    update_properties = world.to_notion_properties(UPDATE_COLUMNS)
+
+    async def operation(attempt):
+        updated_page = await notion_manager.update_page_properties(registered.page_id, update_properties,
+                                                                   raise_errors=True)
+        if updated_page:
+            print(f"ページID: {updated_page['id']} を更新しました")
+        return updated_page
+
+    await write_with_retry(registered.id, operation)
+
+
+async def update():
+    """update.main の asyncio 版"""
+    limiter = HostLimiter()
+    async with create_client(get_user_agent()) as client:
+        notion_manager = get_notion_manager(client, limiter)
+
+        print('Step1. 登録済みワールド一覧のIDを取得')
+        pages = await notion_manager.get_raw_values()
+
+        print('Step2. 更新期限が来たワールドを選ぶ')
+        decoder = WorldRecord.compile_decoder(pages[0]['properties']) if pages else None
+        registered_worlds = [WorldRecord.from_notion_page(page, decoder) for page in pages]
+        scheduler = UpdateScheduler()
+        budget = int(os.getenv('UPDATE_BUDGET', DEFAULT_BUDGET))
+        targets = scheduler.due(registered_worlds, budget)
+        print(f'{len(registered_worlds)} 件中 {len(targets)} 件を更新対象にする')
+
+        print('Step3. VRChat API から Notion に登録済みワールドの情報を取得')
+        stop = asyncio.Event()
+        try:
+            await asyncio.gather(*(
+                update_world(client, limiter, notion_manager, scheduler, registered, stop)
+                for registered in targets
+            ))
+        finally:
+            scheduler.save()
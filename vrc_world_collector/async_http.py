@@ -0,0 +1,69 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# ホストごとの (同時接続数, 1秒あたりのリクエスト上限。0 は上限なし)
+HOST_LIMITS: Dict[str, Tuple[int, float]] = {
+    'api.notion.com': (3, 3),
+    'api.vrchat.cloud': (2, 1),
+}
+DEFAULT_HOST_LIMIT = (8, 0)
+
+
+class AsyncRateLimiter:
+    """
+    一定間隔以上空けてリクエストさせる asyncio 用のクラス
+    """
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0
+        self.lock = asyncio.Lock()
+        self.next_time = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            await asyncio.sleep(wait_time)
+
+
+class HostLimiter:
+    """
+    ホストごとに同時接続数とリクエスト間隔を制限するクラス
+    """
+    def __init__(self, limits: Dict[str, Tuple[int, float]] = None):
+        self.limits = HOST_LIMITS if limits is None else limits
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.rate_limiters: Dict[str, AsyncRateLimiter] = {}
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        host = urlsplit(url).hostname
+        if host not in self.semaphores:
+            concurrency, requests_per_second = self.limits.get(host, DEFAULT_HOST_LIMIT)
+            self.semaphores[host] = asyncio.Semaphore(concurrency)
+            self.rate_limiters[host] = AsyncRateLimiter(requests_per_second)
+        async with self.semaphores[host]:
+            await self.rate_limiters[host].wait()
+            yield
+
+
+def create_client(user_agent: str = None) -> httpx.AsyncClient:
+    """
+    全ホストで共有する HTTP クライアントを作成
+
+    Args:
+        user_agent (str, optional): User-Agent ヘッダ
+
+    Returns:
+        httpx.AsyncClient: 作成したクライアント
+    """
+    headers = {'User-Agent': user_agent} if user_agent else None
+    return httpx.AsyncClient(headers=headers, timeout=httpx.Timeout(30.0))
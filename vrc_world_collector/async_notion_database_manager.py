@@ -0,0 +1,205 @@
+from typing import Any, Dict, List
+
+import httpx
+
+from async_http import HostLimiter
+from notion_database_manager import NotionDatabaseManager, NotionRequestError
+from notion_decoder import compile_decoder
+
+
+def to_request_error(e: httpx.HTTPError) -> NotionRequestError:
+    status_code = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+    return NotionRequestError(str(e), status_code)
+
+
+class AsyncNotionDatabaseManager(NotionDatabaseManager):
+    """
+    NotionDatabaseManager の asyncio 版
+
+    HTTP クライアントとホストごとの制限は呼び出し側と共有する。
+    """
+    def __init__(self, database_id: str, api_key: str, client: httpx.AsyncClient, limiter: HostLimiter):
+        """
+        Args:
+            database_id (str): 対象のデータベースID
+            api_key (str): Notion API キー
+            client (httpx.AsyncClient): 共有する HTTP クライアント
+            limiter (HostLimiter): 共有するホストごとの制限
+        """
+        super().__init__(database_id, api_key)
+        self.client = client
+        self.limiter = limiter
+
+    async def _request(self, method: str, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        async with self.limiter.limit(url):
+            response = await self.client.request(method, url, headers=self.headers, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def update_page_properties(self, page_id: str, properties: Dict[str, Any], name: str = None,
+                                     raise_errors: bool = False) -> Dict[str, Any]:
+        """
+        指定されたページのプロパティを更新する
+
+        Args:
+            page_id (str): 更新対象のページID
+            properties (dict): 更新するプロパティの辞書
+            raise_errors (bool, optional): 失敗時に None を返す代わりに NotionRequestError を送出する
+
+        Returns:
+            dict: 更新されたページの詳細
+        """
+        url = f'{self.base_url}/pages/{page_id}'
+        if name:
+            properties = {'Name': {'title': [{'type': 'text', 'text': {'content': name}}]}, **properties}
+
+        try:
+            return await self._request('PATCH', url, {'properties': properties})
+
+        except httpx.HTTPError as e:
+            print(f"ページ更新中にエラーが発生: {e}")
+            if isinstance(e, httpx.HTTPStatusError):
+                print(f"エラーの詳細: {e.response.text}")
+            if raise_errors:
+                raise to_request_error(e) from e
+            return None
+
+    async def add_database_record(self, properties: Dict[str, Any], content: str = None,
+                                  raise_errors: bool = False) -> Dict[str, Any]:
+        """
+        データベースに新しいレコードを追加
+
+        Args:
+            properties (dict): データベースのプロパティ
+            content (str, optional): ページに追加するテキストコンテンツ
+            raise_errors (bool, optional): 失敗時に None を返す代わりに NotionRequestError を送出する
+
+        Returns:
+            dict: 作成されたページの詳細
+        """
+        url = f'{self.base_url}/pages'
+        payload = {
+            'parent': {'database_id': self.database_id},
+            'properties': properties
+        }
+        if content:
+            payload['children'] = [
+                {
+                    'object': 'block',
+                    'type': 'paragraph',
+                    'paragraph': {
+                        'rich_text': [{'type': 'text', 'text': {'content': content}}]
+                    }
+                }
+            ]
+
+        try:
+            return await self._request('POST', url, payload)
+
+        except httpx.HTTPError as e:
+            print(f"レコード追加中にエラーが発生: {e}")
+            if raise_errors:
+                raise to_request_error(e) from e
+            return None
+
+    async def query_database(self, sorts: List[Dict[str, str]] = None) -> List[Any]:
+        """
+        データベースのすべてのページを取得する。失敗した場合は例外を送出する
+
+        Args:
+            sorts (list, optional): ソート条件
+
+        Returns:
+            list: すべてのページ
+        """
+        url = f'{self.base_url}/databases/{self.database_id}/query'
+        payload = {'page_size': 100}
+        if sorts:
+            payload['sorts'] = sorts
+
+        all_data = []
+        while True:
+            data = await self._request('POST', url, payload)
+            all_data.extend(data.get('results', []))
+            if not data.get('has_more', False):
+                break
+            payload['start_cursor'] = data.get('next_cursor')
+        return all_data
+
+    async def retrieve_page(self, page_id: str) -> Dict[str, Any]:
+        """
+        ページを1件取得する
+
+        Args:
+            page_id (str): ページID
+
+        Returns:
+            dict: ページ。取得できなかった場合は None
+        """
+        url = f'{self.base_url}/pages/{page_id}'
+        try:
+            return await self._request('GET', url, None)
+
+        except httpx.HTTPError as e:
+            print(f"データ取得中にエラーが発生: {e}")
+            return None
+
+    async def get_raw_values(self) -> List[Any]:
+        try:
+            return await self.query_database()
+
+        except httpx.HTTPError as e:
+            print(f"データ取得中にエラーが発生: {e}")
+            return []
+
+    async def find_page_by_world_id(self, world_id: str) -> Dict[str, Any]:
+        """
+        ID 列が一致するページを1件取得する
+
+        Args:
+            world_id (str): ワールドID
+
+        Returns:
+            dict: 見つかったページ。存在しない場合は None
+
+        Raises:
+            NotionRequestError: 取得に失敗した場合。存在しない場合と区別するため None は返さない
+        """
+        url = f'{self.base_url}/databases/{self.database_id}/query'
+        payload = {
+            'filter': {
+                'property': 'ID',
+                'rich_text': {'equals': world_id},
+            },
+            'page_size': 1,
+        }
+
+        try:
+            results = (await self._request('POST', url, payload)).get('results', [])
+            return results[0] if results else None
+
+        except httpx.HTTPError as e:
+            print(f"データ取得中にエラーが発生: {e}")
+            raise to_request_error(e) from e
+
+    async def get_column_values(self, column_name: str) -> List[Any]:
+        """
+        特定のデータベース内の指定された列のすべての値を取得
+
+        Args:
+            column_name (str): 取得したい列名
+
+        Returns:
+            List[Any]: 指定された列のすべての値
+        """
+        all_data = await self.get_raw_values()
+        if not all_data:
+            return []
+
+        decoder = compile_decoder(all_data[0]['properties'], [column_name])
+        column_values = []
+        for page in all_data:
+            value = decoder.decode(page).get(column_name)
+            if value is not None:
+                column_values.append(value)
+        return column_values
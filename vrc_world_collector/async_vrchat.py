@@ -0,0 +1,36 @@
+import asyncio
+
+import httpx
+
+from async_http import HostLimiter
+from world_record import WorldRecord
+
+VRCHAT_API_URL = 'https://api.vrchat.cloud/api/1'
+
+
+class RequestCancelled(Exception):
+    """レートリミットなどで中断したため、リクエストを送らなかった"""
+
+
+async def get_world_info(client: httpx.AsyncClient, limiter: HostLimiter, world_id: str, platform=(),
+                         stop: asyncio.Event = None) -> WorldRecord:
+    """
+    vrchat.get_world_info の asyncio 版
+
+    Args:
+        stop (asyncio.Event, optional): 設定されている場合はリクエストを送らない。
+            タスクは一斉に開始されるので、順番待ちの後にも確認する
+
+    Raises:
+        httpx.HTTPStatusError: ワールドが存在しない(404)・レートリミット(429)など
+        RequestCancelled: stop が設定されていた場合
+    """
+    url = f'{VRCHAT_API_URL}/worlds/{world_id}'
+    async with limiter.limit(url):
+        if stop is not None and stop.is_set():
+            raise RequestCancelled(world_id)
+        print(f'{world_id} の情報を取得するよ')
+        response = await client.get(url)
+    response.raise_for_status()
+
+    return WorldRecord.from_world_json(response.json(), platform)
@@ -0,0 +1,305 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional
+
+from world_record import WorldRecord
+
+SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), '../world_catalogue.snap')
+
+MAGIC = b'WCAT\x01\x00\x00\x00'
+LENGTH = struct.Struct('<I')
+
+# 毎回変わる値はスナップショットに含めない
+VOLATILE_THUMBNAIL_KEYS = ('url', 'expiry_time')
+
+
+def encode_record(record: WorldRecord) -> bytes:
+    """
+    スナップショットに書き込む形式に変換
+
+    Args:
+        record (WorldRecord): 対象のワールド
+
+    Returns:
+        bytes: UTF-8 の JSON
+    """
+    data = record.to_dict()
+    data['clear_thumbnail'] = [
+        {key: value for key, value in file.items() if key not in VOLATILE_THUMBNAIL_KEYS}
+        for file in data['clear_thumbnail']
+    ]
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class CatalogueSnapshot:
+    """
+    ワールド一覧の追記型スナップショット
+
+    データファイルは先頭のマジックの後に「4バイトの長さ + JSON」のレコードを並べたもので、
+    同じワールドを書き直す場合は末尾に追記する。索引ファイル (.idx) には
+    「ワールドID<TAB>オフセット」を追記し、後に書かれた行を有効とする。
+    読み込みはデータファイルを mmap して、ワールドIDから直接レコードを取り出す。
+    """
+    def __init__(self, path: str = SNAPSHOT_PATH, create: bool = False):
+        """
+        Args:
+            path (str, optional): データファイルのパス。索引は path + '.idx'
+            create (bool, optional): ファイルが無い場合に空のスナップショットとして開く。
+                ファイルは最初に追記する時に作成する
+
+        Raises:
+            FileNotFoundError: ファイルが無く、create が False の場合
+        """
+        self.path = path
+        self.index_path = f'{path}.idx'
+        self.offsets: Dict[str, int] = {}
+        self._file = None
+        self._mmap = None
+
+        if not os.path.exists(path):
+            if not create:
+                raise FileNotFoundError(f'スナップショットがありません: {path}')
+            return
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    world_id, offset = line.rstrip('\n').split('\t')
+                    self.offsets[world_id] = int(offset)
+            # 索引の書き込み途中で終了した場合などは作り直す
+            if any(offset >= os.path.getsize(self.path) for offset in self.offsets.values()):
+                raise ValueError('索引がデータファイルと一致しません')
+        except (OSError, ValueError) as e:
+            print(f'スナップショットの索引を作り直します: {e}')
+            self._rebuild_index()
+
+    def _rebuild_index(self):
+        self.offsets = {}
+        data = self._map()
+        if data is None:
+            return
+        position = len(MAGIC)
+        while position + LENGTH.size <= len(data):
+            (length,) = LENGTH.unpack_from(data, position)
+            end = position + LENGTH.size + length
+            if end > len(data):
+                # 書き込み途中のレコードは無視する
+                break
+            record = json.loads(data[position + LENGTH.size:end])
+            self.offsets[record['id']] = position
+            position = end
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            for world_id, offset in self.offsets.items():
+                f.write(f'{world_id}\t{offset}\n')
+
+    def _map(self) -> Optional[mmap.mmap]:
+        size = os.path.getsize(self.path)
+        if self._mmap is not None and len(self._mmap) == size:
+            return self._mmap
+        self.close()
+        if size <= len(MAGIC):
+            return None
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'スナップショットの形式が不正です: {self.path}')
+        return self._mmap
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, world_id: str):
+        return world_id in self.offsets
+
+    def __iter__(self) -> Iterator[WorldRecord]:
+        for world_id in self.offsets:
+            yield self.get(world_id)
+
+    def ids(self) -> List[str]:
+        return list(self.offsets)
+
+    def get_raw(self, world_id: str) -> Optional[bytes]:
+        """
+        ワールドのレコードを JSON のまま取り出す
+
+        Args:
+            world_id (str): ワールドID
+
+        Returns:
+            bytes: UTF-8 の JSON。存在しない場合は None
+        """
+        offset = self.offsets.get(world_id)
+        if offset is None:
+            return None
+        data = self._map()
+        (length,) = LENGTH.unpack_from(data, offset)
+        start = offset + LENGTH.size
+        return data[start:start + length]
+
+    def get(self, world_id: str) -> Optional[WorldRecord]:
+        """
+        ワールドのレコードを取り出す。サムネイルの URL は含まない
+
+        Args:
+            world_id (str): ワールドID
+
+        Returns:
+            WorldRecord: レコード。存在しない場合は None
+        """
+        raw = self.get_raw(world_id)
+        return WorldRecord.from_dict(json.loads(raw)) if raw is not None else None
+
+    def update(self, records: List[WorldRecord]) -> int:
+        """
+        内容が変わったワールドだけを追記する
+
+        ID が空のワールドは追記しない。同じ ID のワールドが複数ある場合は後のものを有効とする。
+
+        Args:
+            records (List[WorldRecord]): 最新のワールド
+
+        Returns:
+            int: 追記したレコード数
+        """
+        # 書き込み中のデータはまだファイルに反映されていないので、追記前の内容とだけ比べる
+        payloads: Dict[str, bytes] = {}
+        for record in records:
+            if not record.id:
+                print(f'ID が空のためスナップショットに追記しません: {record.name}')
+                continue
+            payloads[record.id] = encode_record(record)
+        changed = {
+            world_id: payload for world_id, payload in payloads.items()
+            if self.get_raw(world_id) != payload
+        }
+        if not changed:
+            return 0
+
+        if not os.path.exists(self.path):
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+            open(self.index_path, 'w').close()
+
+        offsets = {}
+        with open(self.path, 'ab') as data_file, open(self.index_path, 'a', encoding='utf-8') as index_file:
+            position = data_file.tell()
+            for world_id, payload in changed.items():
+                data_file.write(LENGTH.pack(len(payload)))
+                data_file.write(payload)
+                index_file.write(f'{world_id}\t{position}\n')
+                offsets[world_id] = position
+                position += LENGTH.size + len(payload)
+        self.offsets.update(offsets)
+        return len(changed)
+
+    def garbage_ratio(self) -> float:
+        """
+        上書きされて参照されなくなったレコードの割合 (バイト数)
+        """
+        if not os.path.exists(self.path):
+            return 0.0
+        size = os.path.getsize(self.path) - len(MAGIC)
+        if size <= 0:
+            return 0.0
+        live = sum(LENGTH.size + len(self.get_raw(world_id)) for world_id in self.offsets)
+        return 1.0 - live / size
+
+    def compact(self, world_ids: List[str] = None):
+        """
+        最新のレコードだけを残して書き直す
+
+        Args:
+            world_ids (List[str], optional): 残すワールドID。省略時はすべて
+        """
+        world_ids = self.ids() if world_ids is None else [i for i in world_ids if i in self.offsets]
+        tmp_path = f'{self.path}.tmp'
+        offsets = {}
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            for world_id in world_ids:
+                payload = self.get_raw(world_id)
+                offsets[world_id] = f.tell()
+                f.write(LENGTH.pack(len(payload)))
+                f.write(payload)
+        with open(f'{self.index_path}.tmp', 'w', encoding='utf-8') as f:
+            for world_id, offset in offsets.items():
+                f.write(f'{world_id}\t{offset}\n')
+
+        self.close()
+        os.replace(tmp_path, self.path)
+        os.replace(f'{self.index_path}.tmp', self.index_path)
+        self.offsets = offsets
+
+    def diff(self, other: 'CatalogueSnapshot') -> Dict[str, List[str]]:
+        """
+        other から見て追加・削除・変更されたワールドIDを返す
+
+        Args:
+            other (CatalogueSnapshot): 比較対象 (古い方)
+
+        Returns:
+            dict: {'added': [...], 'removed': [...], 'changed': [...]}
+        """
+        return {
+            'added': [world_id for world_id in self.offsets if world_id not in other],
+            'removed': [world_id for world_id in other.offsets if world_id not in self],
+            'changed': [
+                world_id for world_id in self.offsets
+                if world_id in other and self.get_raw(world_id) != other.get_raw(world_id)
+            ],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='World catalogue snapshot')
+    parser.add_argument('--path', default=SNAPSHOT_PATH, help='Snapshot path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    get_parser = subparsers.add_parser('get', help='Print a world record')
+    get_parser.add_argument('world_id')
+    subparsers.add_parser('ids', help='Print all world IDs')
+    diff_parser = subparsers.add_parser('diff', help='Compare with an older snapshot')
+    diff_parser.add_argument('other')
+    args = parser.parse_args()
+
+    # 読み取りだけのコマンドなので、パスの誤りで空のスナップショットを作らないようにする
+    try:
+        snapshot = CatalogueSnapshot(args.path)
+        other = CatalogueSnapshot(args.other) if args.command == 'diff' else None
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+    with snapshot:
+        if args.command == 'get':
+            raw = snapshot.get_raw(args.world_id)
+            if raw is None:
+                print(f'{args.world_id} はスナップショットにありません')
+            else:
+                print(json.dumps(json.loads(raw), ensure_ascii=False, indent=2))
+        elif args.command == 'ids':
+            for world_id in snapshot.ids():
+                print(world_id)
+        elif args.command == 'diff':
+            with other:
+                print(json.dumps(snapshot.diff(other), ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
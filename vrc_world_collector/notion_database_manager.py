@@ -1,5 +1,35 @@
 from typing import Dict, Any, List
 import requests
+from notion_decoder import compile_decoder
+
+# 応答が無いまま待ち続けないようにする (秒)。タイムアウトは書き込まれたか不明な失敗として扱う
+REQUEST_TIMEOUT = 30
+
+class NotionRequestError(Exception):
+    """
+    Notion へのリクエストの失敗
+
+    Attributes:
+        status_code (int): HTTP ステータスコード。応答が無かった場合は None
+    """
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @classmethod
+    def from_requests(cls, e: requests.exceptions.RequestException) -> 'NotionRequestError':
+        response = getattr(e, 'response', None)
+        return cls(str(e), response.status_code if response is not None else None)
+
+    @property
+    def retryable(self) -> bool:
+        """時間を置けば成功する可能性があるか。429 以外の 4xx は内容の誤りなので再試行しない"""
+        return self.status_code is None or self.status_code == 429 or self.status_code >= 500
+
+    @property
+    def may_have_succeeded(self) -> bool:
+        """Notion 側では処理された可能性があるか (タイムアウト・5xx)"""
+        return self.status_code is None or self.status_code >= 500
 
 class NotionDatabaseManager:
     def __init__(self, database_id: str, api_key: str):
@@ -19,13 +49,15 @@ class NotionDatabaseManager:
             'Notion-Version': '2022-06-28'
         }
 
-    def update_page_properties(self, page_id: str, properties: Dict[str, Any], name: str = None) -> Dict[str, Any]:
+    def update_page_properties(self, page_id: str, properties: Dict[str, Any], name: str = None,
+                               raise_errors: bool = False) -> Dict[str, Any]:
         """
         指定されたページのプロパティを更新する
 
         Args:
             page_id (str): 更新対象のページID
             properties (dict): 更新するプロパティの辞書
+            raise_errors (bool, optional): 失敗時に None を返す代わりに NotionRequestError を送出する
 
         Returns:
             dict: 更新されたページの詳細
@@ -56,7 +88,7 @@ class NotionDatabaseManager:
             }
 
         try:
-            response = requests.patch(url, headers=self.headers, json=payload)
+            response = requests.patch(url, headers=self.headers, json=payload, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
         
@@ -64,16 +96,20 @@ class NotionDatabaseManager:
             print(f"ページ更新中にエラーが発生: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 print(f"エラーの詳細: {e.response.text}")
+            if raise_errors:
+                raise NotionRequestError.from_requests(e) from e
             return None
 
 
-    def add_database_record(self, properties: Dict[str, Any], content: str = None) -> Dict[str, Any]:
+    def add_database_record(self, properties: Dict[str, Any], content: str = None,
+                            raise_errors: bool = False) -> Dict[str, Any]:
         """
         データベースに新しいレコードを追加
 
         Args:
             properties (dict): データベースのプロパティ
             content (str, optional): ページに追加するテキストコンテンツ
+            raise_errors (bool, optional): 失敗時に None を返す代わりに NotionRequestError を送出する
 
         Returns:
             dict: 作成されたページの詳細
@@ -106,12 +142,14 @@ class NotionDatabaseManager:
             ]
 
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = requests.post(url, headers=self.headers, json=payload, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             return response.json()
         
         except requests.exceptions.RequestException as e:
             print(f"レコード追加中にエラーが発生: {e}")
+            if raise_errors:
+                raise NotionRequestError.from_requests(e) from e
             return None
 
     def get_raw_values(self) -> List[Any]:
@@ -132,7 +170,7 @@ class NotionDatabaseManager:
                     payload['start_cursor'] = next_cursor
 
                 # データベースのクエリを実行
-                response = requests.post(url, headers=self.headers, json=payload)
+                response = requests.post(url, headers=self.headers, json=payload, timeout=REQUEST_TIMEOUT)
                 response.raise_for_status()
                 data = response.json()
 
@@ -150,6 +188,38 @@ class NotionDatabaseManager:
             print(f"データ取得中にエラーが発生: {e}")
             return []
 
+    def find_page_by_world_id(self, world_id: str) -> Dict[str, Any]:
+        """
+        ID 列が一致するページを1件取得する
+
+        Args:
+            world_id (str): ワールドID
+
+        Returns:
+            dict: 見つかったページ。存在しない場合は None
+
+        Raises:
+            NotionRequestError: 取得に失敗した場合。存在しない場合と区別するため None は返さない
+        """
+        url = f'{self.base_url}/databases/{self.database_id}/query'
+        payload = {
+            'filter': {
+                'property': 'ID',
+                'rich_text': {'equals': world_id},
+            },
+            'page_size': 1,
+        }
+
+        try:
+            response = requests.post(url, headers=self.headers, json=payload, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            results = response.json().get('results', [])
+            return results[0] if results else None
+
+        except requests.exceptions.RequestException as e:
+            print(f"データ取得中にエラーが発生: {e}")
+            raise NotionRequestError.from_requests(e) from e
+
     def get_column_values(self, column_name: str) -> List[Any]:
         """
         特定のデータベース内の指定された列のすべての値を取得
@@ -164,62 +234,21 @@ class NotionDatabaseManager:
             # get_raw_values を利用してすべてのデータを取得
             all_data = self.get_raw_values()
 
+            if not all_data:
+                return []
+
+            # 列の型に応じた取り出し方は最初のページから一度だけ決める
+            decoder = compile_decoder(all_data[0]['properties'], [column_name])
+
             # 指定された列の値を抽出
             column_values = []
             for page in all_data:
-                properties = page.get('properties', {})
-                column_data = properties.get(column_name)
-                
-                if column_data:
-                    # 列の型に応じて値を抽出
-                    value = self._extract_column_value(column_data)
-                    if value is not None:
-                        column_values.append(value)
+                value = decoder.decode(page).get(column_name)
+                if value is not None:
+                    column_values.append(value)
 
             return column_values
 
         except requests.exceptions.RequestException as e:
             print(f"データ取得中にエラーが発生: {e}")
-            return []
-
-    def _extract_column_value(self, column_data: dict) -> Any:
-        """
-        列の型に応じて値を抽出するヘルパーメソッド
-
-        Args:
-            column_data (dict): 列のデータ
-
-        Returns:
-            Any: 抽出された値
-        """
-        # 様々な列の型に対応
-        if column_data.get('type') == 'title':
-            # タイトル型
-            titles = column_data.get('title', [])
-            return titles[0]['plain_text'] if titles else None
-        
-        elif column_data.get('type') == 'rich_text':
-            # リッチテキスト型
-            rich_texts = column_data.get('rich_text', [])
-            return rich_texts[0]['plain_text'] if rich_texts else None
-        
-        elif column_data.get('type') == 'select':
-            # セレクト型
-            return column_data.get('select', {}).get('name')
-        
-        elif column_data.get('type') == 'multi_select':
-            # マルチセレクト型
-            return [
-                item.get('name') 
-                for item in column_data.get('multi_select', [])
-            ]
-        
-        elif column_data.get('type') == 'number':
-            # 数値型
-            return column_data.get('number')
-        
-        elif column_data.get('type') == 'date':
-            # 日付型
-            return column_data.get('date', {}).get('start')
-        
-        return None
\ No newline at end of file
+            return []
\ No newline at end of file
@@ -0,0 +1,129 @@
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+
+# 型ごとの値の取り出し方
+def _title(prop):
+    titles = prop['title']
+    return titles[0]['plain_text'] if titles else None
+
+def _rich_text(prop):
+    rich_texts = prop['rich_text']
+    return rich_texts[0]['plain_text'] if rich_texts else None
+
+def _number(prop):
+    return prop['number']
+
+def _select(prop):
+    select = prop['select']
+    return select['name'] if select else None
+
+def _multi_select(prop):
+    return [item['name'] for item in prop['multi_select']]
+
+def _date(prop):
+    date = prop['date']
+    return date['start'] if date else None
+
+def _checkbox(prop):
+    return prop['checkbox']
+
+def _url(prop):
+    return prop['url']
+
+def _email(prop):
+    return prop['email']
+
+def _phone_number(prop):
+    return prop['phone_number']
+
+def _files(prop):
+    # Notion にアップロードされたファイル(file)と外部URL(external)の両方に対応
+    files = []
+    for file in prop['files']:
+        body = file[file['type']]
+        files.append({
+            'name': file['name'],
+            'url': body['url'],
+            'expiry_time': body.get('expiry_time'),
+        })
+    return files
+
+
+EXTRACTORS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'title': _title,
+    'rich_text': _rich_text,
+    'number': _number,
+    'select': _select,
+    'multi_select': _multi_select,
+    'date': _date,
+    'checkbox': _checkbox,
+    'url': _url,
+    'email': _email,
+    'phone_number': _phone_number,
+    'files': _files,
+}
+
+
+def extract_value(prop: Dict[str, Any]) -> Any:
+    """
+    1つのプロパティの値を取り出す
+
+    Args:
+        prop (dict): Notion のプロパティデータ
+
+    Returns:
+        Any: 取り出した値。未対応の型の場合は None
+    """
+    extractor = EXTRACTORS.get(prop.get('type'))
+    return extractor(prop) if extractor else None
+
+
+class PageDecoder:
+    """
+    データベースのスキーマから列ごとの取り出し関数を事前に決めておき、
+    ページ全体を1回の走査で辞書に変換するクラス
+    """
+    __slots__ = ('columns',)
+
+    def __init__(self, columns: List[Tuple[str, Callable[[Dict[str, Any]], Any]]]):
+        self.columns = columns
+
+    def decode(self, page: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        ページのプロパティを {列名: 値} に変換
+
+        Args:
+            page (dict): Notion のページ
+
+        Returns:
+            dict: 列名と値の辞書。ページに存在しない列は含まない
+        """
+        properties = page['properties']
+        values = {}
+        for name, extractor in self.columns:
+            prop = properties.get(name)
+            if prop is not None:
+                values[name] = extractor(prop)
+        return values
+
+
+def compile_decoder(schema: Dict[str, Any], columns: Iterable[str] = None) -> PageDecoder:
+    """
+    スキーマから PageDecoder を作成
+
+    Args:
+        schema (dict): データベースの properties。ページの properties も同じ形なので代わりに使える
+        columns (Iterable[str], optional): 取り出す列名。省略時は対応している型の列すべて
+
+    Returns:
+        PageDecoder: 作成したデコーダ
+    """
+    wanted = None if columns is None else set(columns)
+    compiled = []
+    for name, prop in schema.items():
+        if wanted is not None and name not in wanted:
+            continue
+        extractor = EXTRACTORS.get(prop.get('type'))
+        if extractor:
+            compiled.append((name, extractor))
+    return PageDecoder(compiled)
@@ -0,0 +1,143 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable
+
+import notion
+from notion_database_manager import NotionDatabaseManager, NotionRequestError
+from rate_limiter import RateLimiter
+from world_record import WorldRecord
+
+# 作成直後のページはデータベースの検索に現れるまで時間がかかることがある
+INDEX_DELAY_SECONDS = 5
+
+
+class NotionWriteQueue:
+    """
+    Notion への書き込みをバックグラウンドで実行するキュー
+
+    VRChat からの取得を続けながら書き込めるように、作成・更新をワーカースレッドで処理する。
+    各操作はワールドIDで管理し、同じワールドのページを重複して作成しないようにする。
+    """
+    def __init__(self, notion_manager: NotionDatabaseManager, known_world_ids: Iterable[str] = (),
+                 max_workers: int = 3, requests_per_second: float = 3, max_pending: int = 20,
+                 max_retries: int = 3):
+        """
+        Args:
+            notion_manager (NotionDatabaseManager): 書き込み先
+            known_world_ids (Iterable[str], optional): Notion に登録済みのワールドID
+            max_workers (int, optional): 同時に書き込むスレッド数
+            requests_per_second (float, optional): Notion へのリクエスト上限 (Notion の制限は平均3回/秒)
+            max_pending (int, optional): 未処理の操作の上限。超えると enqueue 側が待たされる
+            max_retries (int, optional): 失敗時の再試行回数
+        """
+        self.notion_manager = notion_manager
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.max_retries = max_retries
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.pending = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        # 作成済み・作成予定のワールドID
+        self.claimed_world_ids = set(known_world_ids)
+        self.futures = []
+        self.succeeded = 0
+        self.failed = []
+
+    def create(self, record: WorldRecord) -> bool:
+        """
+        ページ作成を予約する
+
+        Args:
+            record (WorldRecord): 作成するワールド
+
+        Returns:
+            bool: 予約した場合は True。登録済み・予約済みの場合は False
+        """
+        with self.lock:
+            if record.id in self.claimed_world_ids:
+                return False
+            self.claimed_world_ids.add(record.id)
+
+        # 前回までの作成が Notion 側で処理された可能性があるか
+        may_exist = False
+
+        def operation(attempt):
+            nonlocal may_exist
+            if may_exist:
+                # タイムアウトや 5xx でも作成済みの場合があるので、検索で無いと確認できた場合だけ作り直す。
+                # 検索に失敗した場合は NotionRequestError となり、次の試行で再度確認する
+                time.sleep(INDEX_DELAY_SECONDS)
+                if self.notion_manager.find_page_by_world_id(record.id):
+                    print(f'{record.id} は作成済みだったため再作成しない')
+                    return True
+                self.rate_limiter.wait()
+            try:
+                return notion.add_record(self.notion_manager, record, raise_errors=True)
+            except NotionRequestError as e:
+                may_exist = may_exist or e.may_have_succeeded
+                raise
+
+        self._submit(record.id, operation)
+        return True
+
+    def update(self, world_id: str, page_id: str, properties: Dict[str, Any]):
+        """
+        ページ更新を予約する
+
+        Args:
+            world_id (str): 対象のワールドID
+            page_id (str): 更新対象のページID
+            properties (dict): 更新するプロパティの辞書
+        """
+        def operation(attempt):
+            updated_page = self.notion_manager.update_page_properties(page_id, properties, raise_errors=True)
+            if updated_page:
+                print(f"ページID: {updated_page['id']} を更新しました")
+            return updated_page
+
+        self._submit(world_id, operation)
+
+    def _submit(self, world_id: str, operation: Callable[[int], Any]):
+        # 処理待ちが多すぎる場合はここで待つ
+        self.pending.acquire()
+        future = self.executor.submit(self._run, world_id, operation)
+        future.add_done_callback(lambda _: self.pending.release())
+        self.futures.append(future)
+
+    def _run(self, world_id: str, operation: Callable[[int], Any]):
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(2 ** attempt)
+            self.rate_limiter.wait()
+            try:
+                if operation(attempt):
+                    with self.lock:
+                        self.succeeded += 1
+                    return
+            except NotionRequestError as e:
+                print(f'{world_id} の書き込み中にエラーが発生: {e}')
+                if not e.retryable:
+                    # 入力内容の誤りなどは何度送っても失敗するので再試行しない
+                    break
+            except Exception as e:
+                print(f'{world_id} の書き込み中にエラーが発生: {e}')
+        print(f'{world_id} の書き込みに失敗しました')
+        with self.lock:
+            self.failed.append(world_id)
+
+    def join(self):
+        """予約済みの操作がすべて終わるまで待つ"""
+        for future in self.futures:
+            future.result()
+        self.futures = []
+
+    def close(self):
+        self.join()
+        self.executor.shutdown()
+        print(f'Notion への書き込み: 成功 {self.succeeded} 件, 失敗 {len(self.failed)} 件')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,20 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    複数スレッドから呼ばれても一定間隔以上空けてリクエストさせるクラス
+    """
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
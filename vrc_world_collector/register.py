@@ -2,6 +2,7 @@ import os
 from dotenv import load_dotenv
 import notion
 from notion_database_manager import NotionDatabaseManager
+from notion_write_queue import NotionWriteQueue
 import vrchat
 from vrchatapi import (WorldsApi, ApiClient)
 from vrchatapi.exceptions import NotFoundException
@@ -35,7 +36,8 @@ def main():
     print('Step1. 登録済みワールド一覧のIDを取得')
     registered_world_id = notion.get_registered_world_id(notion_manager)
 
-    with ApiClient() as api_client:
+    # Notion への書き込みは別スレッドで行い、その間も VRChat からの取得を続ける
+    with ApiClient() as api_client, NotionWriteQueue(notion_manager, registered_world_id) as write_queue:
         world_api = get_world_api(api_client)
 
         print('Step2. Quest対応ワールドを登録')
@@ -47,8 +49,9 @@ def main():
                     if id in registered_world_id:
                         print('登録済み。スキップする。')
                         continue
-                    world_info = vrchat.get_world_info(world_api, id)
-                    notion.add_record(notion_manager, platform_support_pc=True, platform_support_quest=True, **world_info)
+                    record = vrchat.get_world_info(world_api, id, platform=['PC', 'Android'])
+                    if not write_queue.create(record):
+                        print('登録予定。スキップする。')
                 except NotFoundException:
                     print(f'{id.strip()} のワールドが見つかりません。スキップ。')
                     continue
@@ -62,8 +65,9 @@ def main():
                     if id in registered_world_id:
                         print('登録済み。スキップする。')
                         continue
-                    world_info = vrchat.get_world_info(world_api, id)
-                    notion.add_record(notion_manager, platform_support_pc=True, platform_support_quest=False, **world_info)
+                    record = vrchat.get_world_info(world_api, id, platform=['PC'])
+                    if not write_queue.create(record):
+                        print('登録予定。スキップする。')
                 except NotFoundException:
                     print(f'{id.strip()} のワールドが見つかりません。スキップ。')
                     continue
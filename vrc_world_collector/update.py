@@ -1,6 +1,8 @@
 import os
 from notion_database_manager import NotionDatabaseManager
-from notion_property_builder import NotionPropertyBuilder
+from notion_write_queue import NotionWriteQueue
+from update_scheduler import DEFAULT_BUDGET, UpdateScheduler
+from world_record import WorldRecord
 import vrchat
 import vrchatapi
 from vrchatapi import WorldsApi
@@ -27,6 +29,9 @@ def get_notion_manager():
 def parse_world_id(url: str):
     return re.findall('^https://vrchat.com/home/world/(.*)', url)[0]
 
+# VRChat API の値で上書きする列
+UPDATE_COLUMNS = ('Name', 'Description', 'Author', 'ReleaseStatus', 'PublicationDate')
+
 
 def main():
     # TODO: 専用のコマンドを作成して、環境変数を読み込むようにする
@@ -41,46 +46,49 @@ def main():
         print(f"Notion API からページを取得できませんでした: {e}")
         return
 
-    try:
-        with vrchatapi.ApiClient() as api_client:
-            print('Step2. VRChat API から Notion に登録済みワールドの情報を取得')
-            for page in pages:
-                properties = page.get('properties', {})
-                page_id = page.get('id')
-                world_id = properties.get('ID', {}).get('rich_text', [])[0]['plain_text']
-                world_api = get_world_api(api_client)
+    print('Step2. 更新期限が来たワールドを選ぶ')
+    decoder = WorldRecord.compile_decoder(pages[0]['properties']) if pages else None
+    registered_worlds = [WorldRecord.from_notion_page(page, decoder) for page in pages]
+    scheduler = UpdateScheduler()
+    budget = int(os.getenv('UPDATE_BUDGET', DEFAULT_BUDGET))
+    targets = scheduler.due(registered_worlds, budget)
+    print(f'{len(registered_worlds)} 件中 {len(targets)} 件を更新対象にする')
 
+    try:
+        # Notion への書き込みは別スレッドで行い、その間も VRChat からの取得を続ける
+        with vrchatapi.ApiClient() as api_client, NotionWriteQueue(notion_manager) as write_queue:
+            print('Step3. VRChat API から Notion に登録済みワールドの情報を取得')
+            world_api = get_world_api(api_client)
+            for registered in targets:
                 try:
-                    world_info = vrchat.get_world_info(world_api, world_id)
+                    world = vrchat.get_world_info(world_api, registered.id)
 
-                    if world_info['publication_date'] == 'none':
+                    if world.publication_date is None:
                         print('Private worldなので、公開日を登録しない')
-                        publication_date = {}
-                    else:
-                        publication_date = {
-                            'PublicationDate': NotionPropertyBuilder.date(world_info['publication_date']),
-                        }
-
-                    update_properties = {
-                        'Description': NotionPropertyBuilder.rich_text(world_info['description']),
-                        'Author': NotionPropertyBuilder.rich_text(world_info['author']),
-                        'ReleaseStatus': NotionPropertyBuilder.select(world_info['release_status']),
-                        **publication_date,
-                    }
-                    updated_page = notion_manager.update_page_properties(page_id, update_properties, world_info['name'])
-                    if updated_page:
-                        print(f"ページID: {updated_page['id']} を更新しました")
+
+                    changed_columns = world.changed_columns(registered, UPDATE_COLUMNS)
+                    scheduler.mark_checked(registered.id, bool(changed_columns))
+                    if not changed_columns:
+                        print(f'{registered.id} は変更が無いためスキップ')
+                        continue
+
+                    update_properties = world.to_notion_properties(UPDATE_COLUMNS)
+                    write_queue.update(registered.id, registered.page_id, update_properties)
                 except ApiException as api_error:
                     if api_error.status == 429:
                         print("エラー: レートリミットを超えました (429 Too Many Requests)。処理を中断します。")
                         return
                     else:
                         print(f"VRChat API エラーが発生しました: {api_error}")
+                        # 失敗し続けるワールドで毎回予算を使わないよう、確認済みにしておく
+                        scheduler.mark_checked(registered.id, False)
                         continue
     except Exception as e:
         # 中断しないようにする
         print(f"エラーが発生しました: {e}")
         return
+    finally:
+        scheduler.save()
 
 
 if __name__ == '__main__':
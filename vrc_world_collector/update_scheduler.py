@@ -0,0 +1,129 @@
+import datetime
+import json
+import os
+from typing import Dict, Iterable, List
+
+from world_record import WorldRecord
+
+SCHEDULE_PATH = os.path.join(os.path.dirname(__file__), '../update_schedule.json')
+
+# 公開からの経過日数ごとの更新間隔 (経過日数の上限, 更新間隔)
+AGE_INTERVALS = (
+    (30, datetime.timedelta(days=1)),
+    (180, datetime.timedelta(days=3)),
+    (365, datetime.timedelta(days=7)),
+)
+DEFAULT_INTERVAL = datetime.timedelta(days=14)
+
+# 最近内容が変わったワールドは、しばらく短い間隔で確認する
+RECENT_CHANGE_PERIOD = datetime.timedelta(days=30)
+RECENT_CHANGE_INTERVAL = datetime.timedelta(days=2)
+
+# 非公開のワールドは滅多に変わらないので間隔を空ける
+PRIVATE_INTERVAL = datetime.timedelta(days=14)
+
+DEFAULT_BUDGET = 300
+
+# 実行開始時刻は毎日数分〜数十分ずれるので、期限の少し前でも更新対象にする
+SCHEDULE_SLACK = datetime.timedelta(hours=6)
+
+
+class UpdateScheduler:
+    """
+    ワールドごとに更新間隔を決め、期限が来たワールドだけを更新対象にするクラス
+
+    最終確認日時・最終変更日時はローカルの JSON に保存する。
+    """
+    def __init__(self, path: str = SCHEDULE_PATH, now: datetime.datetime = None):
+        """
+        Args:
+            path (str, optional): スケジュールの保存先
+            now (datetime, optional): 現在時刻 (UTC)
+        """
+        self.path = path
+        self.now = now or datetime.datetime.now(datetime.timezone.utc)
+        self.entries: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def save(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+
+    def interval(self, record: WorldRecord) -> datetime.timedelta:
+        """
+        ワールドの更新間隔を求める
+
+        Args:
+            record (WorldRecord): Notion に登録済みのワールド
+
+        Returns:
+            timedelta: 更新間隔
+        """
+        publication_date = _parse_datetime(record.publication_date)
+        if record.release_status != 'public' or publication_date is None:
+            interval = PRIVATE_INTERVAL
+        else:
+            age = (self.now - publication_date).days
+            interval = next((i for days, i in AGE_INTERVALS if age < days), DEFAULT_INTERVAL)
+
+        last_changed = _parse_datetime(self.entries.get(record.id, {}).get('last_changed'))
+        if last_changed and self.now - last_changed < RECENT_CHANGE_PERIOD:
+            interval = min(interval, RECENT_CHANGE_INTERVAL)
+
+        return interval
+
+    def due(self, records: Iterable[WorldRecord], budget: int = DEFAULT_BUDGET) -> List[WorldRecord]:
+        """
+        更新期限が来たワールドを、期限を過ぎている割合が大きい順に budget 件まで返す
+
+        前回の実行より開始が遅れても間隔が1回分延びないよう、期限の SCHEDULE_SLACK 前から対象にする。
+
+        Args:
+            records (Iterable[WorldRecord]): Notion に登録済みのワールド
+            budget (int, optional): 1回の実行で更新する上限
+
+        Returns:
+            List[WorldRecord]: 更新対象のワールド
+        """
+        scored = []
+        for record in records:
+            last_checked = _parse_datetime(self.entries.get(record.id, {}).get('last_checked'))
+            if last_checked is None:
+                # 一度も確認していないワールドを最優先にする
+                scored.append((float('inf'), record))
+                continue
+            elapsed = self.now - last_checked
+            interval = self.interval(record)
+            if elapsed >= interval - SCHEDULE_SLACK:
+                scored.append((elapsed / interval, record))
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [record for _, record in scored[:budget]]
+
+    def mark_checked(self, world_id: str, changed: bool):
+        """
+        確認済みとして記録する
+
+        Args:
+            world_id (str): ワールドID
+            changed (bool): 内容が変わっていた場合は True
+        """
+        entry = self.entries.setdefault(world_id, {})
+        entry['last_checked'] = self.now.isoformat()
+        if changed:
+            entry['last_changed'] = self.now.isoformat()
+
+
+def _parse_datetime(value: str):
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        # 日付のみの場合など
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
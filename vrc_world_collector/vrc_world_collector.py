@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import asyncio
 from dotenv import load_dotenv
 import register
 import update
@@ -10,9 +11,17 @@ def main():
 
     parser = argparse.ArgumentParser(description='VRChat World Collector')
     parser.add_argument('command', choices=['register', 'update'], help='Command to execute')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Run with asyncio and httpx')
     args = parser.parse_args()
 
-    if args.command == 'register':
+    if args.use_async:
+        # httpx が必要なので使うときだけ読み込む
+        import async_collector
+        if args.command == 'register':
+            asyncio.run(async_collector.register())
+        elif args.command == 'update':
+            asyncio.run(async_collector.update())
+    elif args.command == 'register':
         register.main()
     elif args.command == 'update':
         update.main()
@@ -0,0 +1,258 @@
+import datetime
+import re
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Iterable, List, Optional
+
+from notion_decoder import PageDecoder, compile_decoder
+from notion_property_builder import NotionPropertyBuilder as npb
+
+
+def fix_text(text: str):
+    # VRC上の表示が崩れるため、一部文字を通常のASCIIに変換する。
+    fixed_text = re.sub('․', '.', text)
+    fixed_text = re.sub('⁄', '/', fixed_text)
+    fixed_text = re.sub('˸', ':', fixed_text)
+    # これはワールドのフォントが対応していないのでやっている。
+    fixed_text = re.sub('～', '~', fixed_text)
+    return fixed_text
+
+
+@dataclass(slots=True)
+class WorldRecord:
+    """
+    収集側・生成側で共通して扱うワールド情報
+
+    Notion のプロパティ辞書や VRChat の World モデルを毎回辿らずに済むよう、
+    必要な値だけを保持する。
+    """
+    id: str
+    name: str = ''
+    author: str = ''
+    description: str = ''
+    recommended_capacity: Optional[int] = None
+    capacity: Optional[int] = None
+    release_status: Optional[str] = None
+    # Private world の場合は None
+    publication_date: Optional[str] = None
+    platform: List[str] = field(default_factory=list)
+    # 以下はNotion上でのみ管理している値
+    category: Optional[str] = None
+    comment: Optional[str] = None
+    difficulty: Optional[str] = None
+    clear_thumbnail: List[Dict[str, Any]] = field(default_factory=list)
+    page_id: Optional[str] = None
+    last_edited_time: Optional[str] = None
+
+    @classmethod
+    def from_world(cls, world, platform: Iterable[str] = ()) -> 'WorldRecord':
+        """
+        VRChat API の World モデルから作成
+
+        Args:
+            world (World): VRChat API から取得したワールド
+            platform (Iterable[str], optional): 対応プラットフォーム
+
+        Returns:
+            WorldRecord: 作成したレコード
+        """
+        publication_date = world.publication_date
+        return cls(
+            id=world.id,
+            name=fix_text(world.name),
+            author=fix_text(world.author_name),
+            description=fix_text(world.description),
+            recommended_capacity=world.recommended_capacity,
+            capacity=world.capacity,
+            release_status=world.release_status,
+            publication_date=None if publication_date == 'none' else publication_date,
+            platform=list(platform),
+        )
+
+    @classmethod
+    def from_world_json(cls, data: Dict[str, Any], platform: Iterable[str] = ()) -> 'WorldRecord':
+        """
+        VRChat API の worlds/{id} の応答 JSON から作成
+
+        Args:
+            data (dict): VRChat API の応答
+            platform (Iterable[str], optional): 対応プラットフォーム
+
+        Returns:
+            WorldRecord: 作成したレコード
+        """
+        publication_date = data.get('publicationDate')
+        return cls(
+            id=data['id'],
+            name=fix_text(data['name']),
+            author=fix_text(data['authorName']),
+            description=fix_text(data['description']),
+            recommended_capacity=data.get('recommendedCapacity'),
+            capacity=data.get('capacity'),
+            release_status=data.get('releaseStatus'),
+            publication_date=None if publication_date == 'none' else publication_date,
+            platform=list(platform),
+        )
+
+    @staticmethod
+    def compile_decoder(schema: Dict[str, Any]) -> PageDecoder:
+        """
+        WorldRecord に必要な列だけを取り出す PageDecoder を作成
+
+        Args:
+            schema (dict): データベースまたはページの properties
+
+        Returns:
+            PageDecoder: 作成したデコーダ
+        """
+        return compile_decoder(schema, NOTION_COLUMNS)
+
+    @classmethod
+    def from_notion_page(cls, page: Dict[str, Any], decoder: PageDecoder = None) -> 'WorldRecord':
+        """
+        Notion のページ JSON から作成
+
+        Args:
+            page (dict): databases/query 等で取得したページ
+            decoder (PageDecoder, optional): compile_decoder で作成したデコーダ。
+                複数ページを変換する場合は使い回すこと
+
+        Returns:
+            WorldRecord: 作成したレコード
+        """
+        if decoder is None:
+            decoder = cls.compile_decoder(page['properties'])
+        values = decoder.decode(page)
+
+        return cls(
+            id=values.get('ID') or '',
+            name=values.get('Name') or '',
+            author=values.get('Author') or '',
+            description=values.get('Description') or '',
+            recommended_capacity=values.get('RecommendedCapacity'),
+            capacity=values.get('Capacity'),
+            release_status=values.get('ReleaseStatus'),
+            publication_date=values.get('PublicationDate'),
+            platform=values.get('Platform') or [],
+            category=values.get('Category'),
+            comment=values.get('Comment'),
+            difficulty=values.get('Difficulty'),
+            clear_thumbnail=values.get('ClearThumbnail') or [],
+            page_id=page.get('id'),
+            last_edited_time=page.get('last_edited_time'),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WorldRecord':
+        """to_dict の結果から復元"""
+        return cls(**{name: data[name] for name in _FIELD_NAMES if name in data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        """シリアライズ用の辞書に変換"""
+        return {name: getattr(self, name) for name in _FIELD_NAMES}
+
+    def to_notion_properties(self, columns: Iterable[str] = None) -> Dict[str, Any]:
+        """
+        Notion のプロパティ辞書に変換
+
+        Args:
+            columns (Iterable[str], optional): 出力する列名。省略時は VRChat 由来の列すべて
+
+        Returns:
+            dict: add_database_record / update_page_properties に渡すプロパティ
+        """
+        columns = VRCHAT_COLUMNS if columns is None else set(columns)
+        properties = {}
+        for attr, column, builder in _COLUMNS:
+            if column not in columns:
+                continue
+            value = getattr(self, attr)
+            if value is None:
+                # 公開日が無い Private world など
+                continue
+            properties[column] = builder(value)
+        return properties
+
+    def changed_columns(self, other: 'WorldRecord', columns: Iterable[str] = None) -> List[str]:
+        """
+        other と値が異なる列名の一覧を返す
+
+        公開日が無い (Private world になった) 場合、to_notion_properties は公開日を書き込まず
+        以前の公開日を残すので、公開日は比較しない。
+
+        Args:
+            other (WorldRecord): 比較対象
+            columns (Iterable[str], optional): 比較する列名。省略時は VRChat 由来の列すべて
+
+        Returns:
+            List[str]: 値が異なる列名
+        """
+        columns = VRCHAT_COLUMNS if columns is None else set(columns)
+        changed = []
+        for attr, column, _ in _COLUMNS:
+            if column not in columns:
+                continue
+            value, other_value = getattr(self, attr), getattr(other, attr)
+            if attr == 'publication_date':
+                if value is None:
+                    continue
+                # VRChat と Notion で日時の表記が異なるため揃えてから比較する
+                value, other_value = _normalize_date(value), _normalize_date(other_value)
+            if value != other_value:
+                changed.append(column)
+        return changed
+
+    def to_portal_world(self, image_id: int) -> Dict[str, Any]:
+        """ポータルライブラリ用の辞書に変換"""
+        return {
+            'ID': self.id,
+            'Name': self.name,
+            'Author': self.author,
+            'RecommendedCapacity': self.recommended_capacity,
+            'Capacity': self.capacity,
+            'Description': self.description,
+            'ReleaseStatus': self.release_status,
+            'Comment': self.comment or '',
+            'Difficulty': self.difficulty or 'unknown',
+            'Platform': {
+                'PC': True,
+                'Android': 'Android' in self.platform,
+            },
+            'ImageId': image_id,
+        }
+
+
+def _normalize_date(value: Optional[str]):
+    if value is None:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
+# (属性名, Notion の列名, プロパティ作成関数)
+_COLUMNS = (
+    ('name', 'Name', npb.title),
+    ('author', 'Author', npb.rich_text),
+    ('description', 'Description', npb.rich_text),
+    ('platform', 'Platform', npb.multi_select),
+    ('id', 'ID', npb.rich_text),
+    ('recommended_capacity', 'RecommendedCapacity', npb.number),
+    ('capacity', 'Capacity', npb.number),
+    ('release_status', 'ReleaseStatus', npb.select),
+    ('publication_date', 'PublicationDate', npb.date),
+    ('category', 'Category', npb.select),
+    ('comment', 'Comment', npb.rich_text),
+    ('difficulty', 'Difficulty', npb.select),
+)
+
+# VRChat API から取得できる列
+VRCHAT_COLUMNS = frozenset((
+    'Name', 'Author', 'Description', 'Platform', 'ID',
+    'RecommendedCapacity', 'Capacity', 'ReleaseStatus', 'PublicationDate',
+))
+
+# Notion から読み込む列
+NOTION_COLUMNS = frozenset(column for _, column, _ in _COLUMNS) | {'ClearThumbnail'}
+
+_FIELD_NAMES = tuple(f.name for f in fields(WorldRecord))